@@ -0,0 +1,174 @@
+"""
+Benchmark dump_all, dump_update and dump_fix on synthetic data.
+
+Generates ``--symbols`` x ``--days`` bars (see ``synthetic.py``) as a csv,
+parquet or sqlite source and runs each ``init.py`` command in a child
+process:
+
+- ``dump_all`` of the history without the last ``--new_days`` days and
+  without the ``--new_symbols`` last listings,
+- ``dump_update`` of the full source on top of it,
+- ``dump_fix`` of the new listings (history only) on top of the first dump.
+
+Wall time, peak RSS of the child (largest of the command and its workers),
+source rows per second and bytes written are printed and saved as JSON to
+compare versions:
+
+    python benchmarks/bench_dumpers.py --symbols 2000 --days 2500 --format csv \\
+        --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import dumpers  # noqa: E402
+from synthetic import (  # noqa: E402
+    FIELDS,
+    FORMATS,
+    generate,
+    trading_days,
+    write_source,
+)
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def run_command(command: str, source: Path, qlib_dir: Path, args, rows: int) -> dict:
+    """Run one ``init.py`` command in a child process and measure it."""
+    # through dumpers.py: init.py alone does not import on case-sensitive systems
+    cmd = [
+        sys.executable,
+        dumpers.__file__,
+        command,
+        "--data_path",
+        str(source),
+        "--qlib_dir",
+        str(qlib_dir),
+        "--include_fields",
+        ",".join(FIELDS),
+        "--max_workers",
+        str(args.max_workers),
+    ]
+    if args.format == "db":
+        cmd += ["--table_name", "stock_data"]
+    else:
+        cmd += ["--file_suffix", f".{args.format}"]
+    before = dir_bytes(qlib_dir) if qlib_dir.exists() else 0
+    with tempfile.TemporaryFile() as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=log)
+        if hasattr(os, "wait4"):
+            # the rusage of wait4 covers the child and its reaped pool workers
+            _, status, usage = os.wait4(proc.pid, 0)
+            returncode = proc.returncode = os.waitstatus_to_exitcode(status)
+            # kilobytes on linux, bytes on macos
+            scale = 1 if sys.platform == "darwin" else 1024
+            peak_rss_mb = round(usage.ru_maxrss * scale / 1024 / 1024, 1)
+        else:
+            returncode, peak_rss_mb = proc.wait(), None
+        wall = time.perf_counter() - start
+        if returncode != 0:
+            log.seek(0)
+            raise RuntimeError(f"{command} failed:\n{log.read().decode()[-2000:]}")
+    return {
+        "command": command,
+        "wall_seconds": round(wall, 3),
+        "peak_rss_mb": peak_rss_mb,
+        "rows": rows,
+        "rows_per_second": round(rows / wall, 1),
+        "bytes_written": dir_bytes(qlib_dir) - before,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--days", type=int, default=2500)
+    parser.add_argument("--new_days", type=int, default=5)
+    parser.add_argument("--new_symbols", type=int, default=20)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--max_workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="JSON report path")
+    args = parser.parse_args()
+
+    cutoff = trading_days(args.days)[-args.new_days - 1]
+    full, history, listings = {}, {}, {}
+    for i, (symbol, df) in enumerate(generate(args.symbols, args.days, args.seed)):
+        full[symbol] = df
+        old = df[df["date"] <= cutoff]
+        if i >= args.symbols - args.new_symbols:
+            if not old.empty:
+                listings[symbol] = old
+        elif not old.empty:
+            history[symbol] = old
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        old_source, old_rows = write_source(root.joinpath("old"), history, args.format)
+        full_source, full_rows = write_source(root.joinpath("full"), full, args.format)
+        fix_source, fix_rows = write_source(
+            root.joinpath("fix"), {**history, **listings}, args.format
+        )
+        base_dir = root.joinpath("qlib_all")
+        results.append(run_command("dump_all", old_source, base_dir, args, old_rows))
+
+        update_dir = root.joinpath("qlib_update")
+        shutil.copytree(base_dir, update_dir)
+        results.append(
+            run_command("dump_update", full_source, update_dir, args, full_rows)
+        )
+
+        fix_dir = root.joinpath("qlib_fix")
+        shutil.copytree(base_dir, fix_dir)
+        results.append(run_command("dump_fix", fix_source, fix_dir, args, fix_rows))
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "results": results,
+    }
+    for result in results:
+        print(
+            f"{result['command']:12s} {result['wall_seconds']:8.2f}s "
+            f"{result['peak_rss_mb'] or float('nan'):8.1f} MB peak "
+            f"{result['rows_per_second']:12.0f} rows/s "
+            f"{result['bytes_written'] / 1024 / 1024:8.1f} MB written"
+        )
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
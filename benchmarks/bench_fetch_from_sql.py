@@ -0,0 +1,110 @@
+"""
+Compare ``fetch_from_sql`` against the full-table ``read_as_df`` read.
+
+Builds a synthetic ``stock_data`` table (``--symbols`` x ``--days``) and times
+pulling a ``--universe`` slice over ``--years`` years both ways:
+
+    python benchmarks/bench_fetch_from_sql.py --symbols 5000 --days 2500
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1].joinpath("data_loader")))
+
+from data_loader import fetch_from_sql, read_as_df  # noqa: E402
+
+
+def build_table(db_path: Path, n_symbols: int, n_days: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-08-25", periods=n_days).strftime("%Y%m%d")
+    dates = dates.astype(int).to_numpy()
+    symbols = np.array([f"{600000 + i:06d}.SH" for i in range(n_symbols)])
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE stock_data (symbol TEXT, date INTEGER, open REAL, high REAL, "
+        "low REAL, close REAL, volume REAL, amount REAL)"
+    )
+    for symbol in symbols:
+        values = rng.random((n_days, 6))
+        conn.executemany(
+            "INSERT INTO stock_data VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((symbol, int(date), *map(float, row)) for date, row in zip(dates, values)),
+        )
+    conn.commit()
+    conn.close()
+    return symbols, dates
+
+
+def timeit(func, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=2500)
+    parser.add_argument("--universe", type=int, default=300)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir).joinpath("stocks.db")
+        symbols, dates = build_table(db_path, args.symbols, args.days)
+        universe = list(
+            symbols[:: max(len(symbols) // args.universe, 1)][: args.universe]
+        )
+        end_date = int(dates[-1])
+        start_date = end_date - args.years * 10000
+        columns = ["open", "close", "volume"]
+
+        def full_read():
+            df = read_as_df(db_path, table_name="stock_data")
+            df = df[
+                df["symbol"].isin(universe)
+                & (df["date"] >= start_date)
+                & (df["date"] <= end_date)
+            ]
+            return df.loc[:, ["symbol", "date", *columns]]
+
+        def pushdown():
+            return fetch_from_sql(
+                db_path,
+                universe,
+                "stock_data",
+                start_date=start_date,
+                end_date=end_date,
+                columns=columns,
+            )
+
+        # the first call builds the (symbol, date) index, time it separately
+        index_time, _ = timeit(pushdown, 1)
+        full_time, full_df = timeit(full_read, args.repeat)
+        fetch_time, fetch_df = timeit(pushdown, args.repeat)
+        assert len(full_df) == len(fetch_df), (len(full_df), len(fetch_df))
+
+        print(f"table: {args.symbols} symbols x {args.days} days")
+        print(
+            f"slice: {len(universe)} symbols x {args.years} years, {len(fetch_df)} rows"
+        )
+        print(f"index build + first fetch : {index_time:8.3f}s")
+        print(f"read_as_df + filter       : {full_time:8.3f}s")
+        print(f"fetch_from_sql            : {fetch_time:8.3f}s")
+        print(f"speedup                   : {full_time / fetch_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Task dispatch overhead of the dump_update process pool, before and after the
+worker initializer.
+
+Before, every task was ``executor.submit(self._dump_bin, df, calendar)``: the
+bound method pickled the whole dumper, including the concatenated source
+history, once per symbol. Now the dumper (without its loaded data) and the
+shared calendar are sent once per worker and each task only pickles its own
+rows. The script measures the pickled payload and the serialization time of
+both schemes on synthetic data, then times a real ``dump_update``:
+
+    python benchmarks/bench_update_dispatch.py --symbols 2000 --days 2500
+"""
+
+import argparse
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import dumpers  # noqa: E402
+
+dumpers.register_aliases()
+
+from all_dumper import DumpDataAll  # noqa: E402
+from base_dumper import _dump_bin_task, _init_worker  # noqa: E402
+from update_dumper import DumpDataUpdate  # noqa: E402
+
+FIELDS = "open,close,high,low,volume"
+
+
+def build_csv_dirs(root: Path, n_symbols: int, n_days: int, n_new: int):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end="2025-08-25", periods=n_days + n_new)
+    int_dates = dates.strftime("%Y%m%d").astype(int)
+    old_dir, new_dir = root.joinpath("old"), root.joinpath("new")
+    old_dir.mkdir()
+    new_dir.mkdir()
+    for i in range(n_symbols):
+        symbol = f"{600000 + i:06d}.SH"
+        values = rng.random((len(dates), 5))
+        df = pd.DataFrame(values, columns=FIELDS.split(","))
+        df.insert(0, "date", int_dates)
+        df.insert(0, "symbol", symbol)
+        df.iloc[:n_days].to_csv(old_dir.joinpath(f"{symbol}.csv"), index=False)
+        df.to_csv(new_dir.joinpath(f"{symbol}.csv"), index=False)
+    return old_dir, new_dir
+
+
+def measure(payloads):
+    start = time.perf_counter()
+    sizes = [
+        len(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+        for payload in payloads
+    ]
+    return sum(sizes), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--days", type=int, default=2500)
+    parser.add_argument("--new_days", type=int, default=1)
+    parser.add_argument("--max_workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        old_dir, new_dir = build_csv_dirs(root, args.symbols, args.days, args.new_days)
+        qlib_dir = root.joinpath("qlib")
+        DumpDataAll(
+            str(old_dir),
+            str(qlib_dir),
+            include_fields=FIELDS,
+            max_workers=args.max_workers,
+        )()
+
+        dumper = DumpDataUpdate(
+            str(new_dir),
+            str(qlib_dir),
+            include_fields=FIELDS,
+            max_workers=args.max_workers,
+        )
+        history = pd.concat(
+            [pd.read_csv(path) for path in sorted(new_dir.glob("*.csv"))], sort=False
+        )
+        # SymbolPartitions, iterated like DumpDataUpdate._dump_features does
+        groups = [group for _, group in dumper._all_data]
+        calendar = dumper._new_calendar_list[-args.new_days :]
+
+        # previous scheme: the bound method carried the full dumper state,
+        # including the concatenated source history, into every task
+        legacy_state = dict(vars(dumper), _all_data=history)
+        before_bytes, before_time = measure(
+            (legacy_state, group, calendar) for group in groups
+        )
+        init_bytes, init_time = measure(
+            [(_init_worker, dumper, dumper._new_calendar_index)] * args.max_workers
+        )
+        task_bytes, task_time = measure(
+            (_dump_bin_task, group, calendar) for group in groups
+        )
+        after_bytes, after_time = init_bytes + task_bytes, init_time + task_time
+
+        start = time.perf_counter()
+        dumper.dump()
+        dump_time = time.perf_counter() - start
+
+    mb = 1024 * 1024
+    print(
+        f"{len(groups)} tasks, {len(history)} history rows, {args.max_workers} workers"
+    )
+    print(
+        f"before: {before_bytes / mb:10.1f} MB pickled, {before_time:7.3f}s, "
+        f"{before_bytes / len(groups) / 1024:10.1f} KB/task"
+    )
+    print(
+        f"after : {after_bytes / mb:10.1f} MB pickled, {after_time:7.3f}s, "
+        f"{task_bytes / len(groups) / 1024:10.1f} KB/task "
+        f"(+{init_bytes / args.max_workers / 1024:.1f} KB once per worker)"
+    )
+    print(f"dump_update wall time: {dump_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Import and run the ``data_loader`` dumpers from the benchmarks.
+
+The dumper files are CamelCase (``All_Dumper.py``...) but import each other,
+and are imported by ``init.py``, by lowercase names, which only resolve on
+case-insensitive file systems. ``register_aliases`` imports them under both
+names. Run as a script, this module is ``init.py`` with the aliases
+registered:
+
+    python benchmarks/dumpers.py dump_all --data_path ... --qlib_dir ...
+"""
+
+import importlib
+import runpy
+import sys
+from pathlib import Path
+
+DATA_LOADER_DIR = Path(__file__).resolve().parents[1].joinpath("data_loader")
+INIT_PY = DATA_LOADER_DIR.joinpath("init.py")
+# in import order, Fix_Dumper imports all_dumper
+DUMPER_MODULES = (
+    "Base_Dumper",
+    "All_Dumper",
+    "Fix_Dumper",
+    "Hf_Dumper",
+    "Patch_Dumper",
+    "Update_Dumper",
+)
+
+
+def register_aliases():
+    if str(DATA_LOADER_DIR) not in sys.path:
+        sys.path.insert(0, str(DATA_LOADER_DIR))
+    for name in DUMPER_MODULES:
+        sys.modules.setdefault(name.lower(), importlib.import_module(name))
+
+
+def run_init(argv):
+    """Run ``init.py`` like ``python data_loader/init.py *argv``."""
+    register_aliases()
+    sys.argv = [str(INIT_PY), *argv]
+    runpy.run_path(str(INIT_PY), run_name="__main__")
+
+
+if __name__ == "__main__":
+    run_init(sys.argv[1:])
@@ -0,0 +1,112 @@
+"""
+Synthetic OHLCV sources for the dumper benchmarks.
+
+``generate`` draws ``n_symbols`` x ``n_days`` daily bars with realistic
+listing gaps: late listings, early delistings and suspension blocks, and
+``write_source`` stores them as a csv or parquet directory (one file per
+symbol) or as a sqlite ``stock_data`` table, in the layout the dumpers read.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ("open", "high", "low", "close", "volume", "amount")
+FORMATS = ("csv", "parquet", "db")
+
+
+def trading_days(n_days: int, end: str = "2025-08-25") -> np.ndarray:
+    """``n_days`` business days ending at ``end``, as YYYYMMDD integers."""
+    return pd.bdate_range(end=end, periods=n_days).strftime("%Y%m%d").astype(int)
+
+
+def symbol_name(i: int) -> str:
+    return f"{600000 + i:06d}.SH" if i % 2 == 0 else f"{i:06d}.SZ"
+
+
+def generate(
+    n_symbols: int,
+    n_days: int,
+    seed: int = 0,
+    late_listing: float = 0.2,
+    delisting: float = 0.05,
+    suspension: float = 0.01,
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Yield ``(symbol, bars)`` for every symbol.
+
+    Parameters
+    ----------
+    late_listing : float
+        Share of symbols listed after the first day.
+    delisting : float
+        Share of symbols delisted before the last day.
+    suspension : float
+        Expected share of suspended days of a symbol, drawn as blocks of
+        1 to 20 days.
+    """
+    rng = np.random.default_rng(seed)
+    dates = trading_days(n_days)
+    for i in range(n_symbols):
+        first = rng.integers(1, n_days) if rng.random() < late_listing else 0
+        last = n_days
+        if rng.random() < delisting:
+            last = rng.integers(first + 1, n_days + 1)
+        keep = np.zeros(n_days, dtype=bool)
+        keep[first:last] = True
+        for _ in range(rng.poisson(suspension * (last - first) / 10)):
+            start = rng.integers(first, last)
+            keep[start : start + rng.integers(1, 21)] = False
+        n = int(keep.sum())
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        open_ = close * (1 + rng.normal(0, 0.005, n))
+        high = np.maximum(open_, close) * (1 + rng.random(n) * 0.01)
+        low = np.minimum(open_, close) * (1 - rng.random(n) * 0.01)
+        volume = rng.lognormal(13, 1, n).round()
+        symbol = symbol_name(i)
+        yield symbol, pd.DataFrame(
+            {
+                "symbol": symbol,
+                "date": dates[keep],
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume,
+                "amount": volume * close,
+            }
+        )
+
+
+def write_source(
+    target: Path, frames: Dict[str, pd.DataFrame], fmt: str = "csv"
+) -> Tuple[Path, int]:
+    """
+    Write ``frames`` as a ``fmt`` source, return its path and its row count.
+
+    csv and parquet sources are directories with one file per symbol, a db
+    source is a sqlite file with a ``stock_data`` table.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}: {fmt}")
+    rows = sum(len(df) for df in frames.values())
+    if fmt == "db":
+        target = target.with_suffix(".db")
+        conn = sqlite3.connect(target)
+        try:
+            for df in frames.values():
+                df.to_sql("stock_data", conn, if_exists="append", index=False)
+            conn.commit()
+        finally:
+            conn.close()
+        return target, rows
+    target.mkdir(parents=True, exist_ok=True)
+    for symbol, df in frames.items():
+        if fmt == "csv":
+            df.to_csv(target.joinpath(f"{symbol}.csv"), index=False)
+        else:
+            df.to_parquet(target.joinpath(f"{symbol}.parquet"), index=False)
+    return target, rows
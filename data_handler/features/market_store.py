@@ -0,0 +1,192 @@
+"""
+Vectorized MongoDB documents for the daily bars of ``stock_market``.
+
+``build_documents`` turns a Tushare ``daily`` frame (one symbol or the whole
+market) into documents with column operations only, including the price
+limits of each board, and ``store_documents`` upserts them with chunked
+unordered ``bulk_write`` calls.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, List, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# daily price limit ratios
+MAIN_BOARD_LIMIT = 0.10
+ST_LIMIT = 0.05
+# STAR Market and ChiNext (after the registration reform)
+GROWTH_BOARD_LIMIT = 0.20
+BSE_LIMIT = 0.30
+CHINEXT_REFORM_DATE = "20200824"
+
+BULK_WRITE_CHUNK_SIZE = 5000
+
+# Tushare daily columns -> document fields
+DOCUMENT_FIELDS = {
+    "ts_code": "symbol",
+    "trade_date": "date",
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "close": "close",
+    "pre_close": "pre_close",
+    "vol": "volume",
+    "amount": "amount",
+}
+
+
+def board_of(symbols: Iterable[str]) -> np.ndarray:
+    """``main``, ``star``, ``chinext`` or ``bse`` for ``000001.SZ``-style symbols."""
+    symbols = pd.Series(list(symbols), dtype=object).astype(str).str.upper()
+    code = symbols.str[:6]
+    exchange = symbols.str.rsplit(".", n=1).str[-1]
+    return np.select(
+        [
+            exchange.eq("BJ").to_numpy(),
+            (exchange.eq("SH") & code.str.startswith("68")).to_numpy(),
+            (exchange.eq("SZ") & code.str.startswith("30")).to_numpy(),
+        ],
+        ["bse", "star", "chinext"],
+        default="main",
+    )
+
+
+def price_limit_ratio(
+    symbols: Iterable[str],
+    trade_dates: Optional[Iterable[str]] = None,
+    is_st: Optional[Iterable[bool]] = None,
+) -> np.ndarray:
+    """
+    Daily price limit of every row as a ratio of the previous close.
+
+    - STAR Market (688/689 .SH): 20%
+    - ChiNext (30x .SZ): 20% from ``CHINEXT_REFORM_DATE``, main board rules
+      before (``trade_dates`` as ``YYYYMMDD``; without dates the 20% applies)
+    - Beijing Stock Exchange (.BJ): 30%
+    - main boards: 10%, 5% for ST stocks
+
+    Parameters
+    ----------
+    symbols : Iterable[str]
+        Tushare symbols of the rows.
+    trade_dates : Iterable[str]
+        Trade date of the rows.
+    is_st : Iterable[bool]
+        ST flag of the rows, None if no row is ST.
+    """
+    board = board_of(symbols)
+    main_rules = board == "main"
+    if trade_dates is not None:
+        trade_dates = pd.Series(list(trade_dates), dtype=object).astype(str)
+        main_rules |= (board == "chinext") & (
+            trade_dates < CHINEXT_REFORM_DATE
+        ).to_numpy()
+    ratio = np.where(
+        board == "bse",
+        BSE_LIMIT,
+        np.where(main_rules, MAIN_BOARD_LIMIT, GROWTH_BOARD_LIMIT),
+    )
+    if is_st is not None:
+        is_st = np.asarray(list(is_st), dtype=bool)
+        ratio = np.where(main_rules & is_st, ST_LIMIT, ratio)
+    return ratio
+
+
+def limit_prices(pre_close: np.ndarray, ratio: np.ndarray):
+    """
+    Limit-up and limit-down prices, rounded half up to the cent like the
+    exchanges do. Computed on integer cents: float rounding of
+    ``pre_close * 1.1`` lands on the wrong side of half a cent for some prices.
+    """
+    cents = np.round(np.asarray(pre_close, dtype=float) * 100)
+    percent = np.round(np.asarray(ratio, dtype=float) * 100)
+    with np.errstate(invalid="ignore"):
+        up = np.floor((cents * (100 + percent) + 50) / 100)
+        down = np.floor((cents * (100 - percent) + 50) / 100)
+    return up / 100, down / 100
+
+
+def build_documents(
+    df: pd.DataFrame,
+    index_component: Union[object, Mapping[str, object]] = None,
+    st_symbols: Optional[Iterable[str]] = None,
+) -> List[dict]:
+    """
+    Documents of a Tushare ``daily`` frame, oldest first.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Rows of one symbol or of the whole market.
+    index_component :
+        Value stored in every document, or a mapping from symbol to value
+        for multi-symbol frames.
+    st_symbols : Iterable[str]
+        Symbols under ST treatment. Without it, ST stocks are detected from
+        a ``name`` column if the frame has one.
+    """
+    if df.empty:
+        return []
+    df = df.sort_values(["ts_code", "trade_date"], kind="stable")
+    docs = df.loc[:, [c for c in DOCUMENT_FIELDS if c in df.columns]].rename(
+        columns=DOCUMENT_FIELDS
+    )
+    symbols = docs["symbol"]
+    if st_symbols is not None:
+        is_st = symbols.isin(set(st_symbols)).to_numpy()
+    elif "name" in df.columns:
+        is_st = df["name"].astype(str).str.contains("ST", regex=False).to_numpy()
+    else:
+        is_st = None
+    ratio = price_limit_ratio(symbols, docs["date"], is_st)
+    docs["limit_up"], docs["limit_down"] = limit_prices(
+        docs["pre_close"].to_numpy(dtype=float), ratio
+    )
+    if isinstance(index_component, Mapping):
+        docs["index_component"] = symbols.map(index_component)
+    else:
+        docs["index_component"] = [index_component] * len(docs)
+    return docs.to_dict("records")
+
+
+@dataclass
+class StoreResult:
+    matched: int = 0
+    modified: int = 0
+    upserted: int = 0
+    errors: int = 0
+
+
+def store_documents(
+    collection,
+    documents: List[dict],
+    chunk_size: int = BULK_WRITE_CHUNK_SIZE,
+) -> StoreResult:
+    """
+    Upsert ``documents`` on ``(symbol, date)`` with unordered ``bulk_write``
+    calls of ``chunk_size`` operations; a failing document does not stop the
+    rest of its chunk.
+    """
+    result = StoreResult()
+    for start in range(0, len(documents), chunk_size):
+        operations = [
+            UpdateOne(
+                {"symbol": doc["symbol"], "date": doc["date"]},
+                {"$set": doc},
+                upsert=True,
+            )
+            for doc in documents[start : start + chunk_size]
+        ]
+        try:
+            chunk = collection.bulk_write(operations, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            chunk = e.details
+            result.errors += len(chunk.get("writeErrors", []))
+        result.matched += chunk.get("nMatched", 0)
+        result.modified += chunk.get("nModified", 0)
+        result.upserted += chunk.get("nUpserted", 0)
+    return result
@@ -0,0 +1,495 @@
+"""
+Concurrent Tushare fetch pipeline.
+
+``MarketSync`` fetches symbols on a pool of threads, every API call going
+through a shared ``TokenBucket`` so the pool stays within the quota of the
+Tushare account, and failed calls are retried with exponential backoff. The
+fetched frames are handed to a single store callback through a bounded
+queue, so Mongo writes overlap with the next fetches and a slow database
+holds the fetchers back instead of piling results up in memory.
+
+Two modes: ``run`` makes one call per symbol over its own date range (deep
+backfills, new listings), ``run_by_date`` one call per trading day for the
+whole market and fans the rows out per symbol (daily top-ups, ~1 call
+instead of ~5000).
+
+The ``pro`` client is only used through ``pro.daily(...)``,
+``pro.trade_cal(...)`` and ``pro.stock_basic(...)``, tests pass a local fake.
+"""
+
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+DAILY_FIELDS = [
+    "ts_code",
+    "trade_date",
+    "open",
+    "high",
+    "low",
+    "close",
+    "pre_close",
+    "vol",
+    "amount",
+]
+
+# names of the stocks under special treatment (5% daily limit)
+ST_NAME_PREFIXES = ("ST", "*ST")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: ``rate`` tokens per second, bursts of up to
+    ``capacity`` tokens.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second, e.g. ``calls_per_minute / 60``.
+    capacity : float
+        Size of the bucket, defaults to one second of tokens (at least 1).
+    clock, sleep :
+        Time functions, replaced by fakes in tests.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive: {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, calls: float, **kwargs) -> "TokenBucket":
+        return cls(calls / 60.0, **kwargs)
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` if available and return 0, else the seconds to wait."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until ``tokens`` are taken."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+
+def call_with_retry(
+    fn: Callable,
+    *args,
+    retries: int = 3,
+    backoff: float = 1.0,
+    max_backoff: float = 30.0,
+    limiter: Optional[TokenBucket] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    **kwargs,
+):
+    """
+    Call ``fn(*args, **kwargs)``, retrying up to ``retries`` times on any
+    exception with full-jitter exponential backoff (``backoff * 2**attempt``
+    seconds at most, capped by ``max_backoff``). Every attempt takes a token
+    of ``limiter`` first. The last exception is re-raised.
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            if attempt == retries:
+                raise
+            sleep(random.uniform(0, min(max_backoff, backoff * 2**attempt)))
+
+
+@dataclass
+class FetchTask:
+    # None for the whole-market frames of run_by_date
+    symbol: Optional[str]
+    start_date: str
+    end_date: str
+    index_component: object = None
+    is_st: bool = False
+
+
+@dataclass
+class SyncReport:
+    total: int = 0
+    fetched: int = 0
+    stored_records: int = 0
+    empty: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.fetched}/{self.total} fetched in {self.seconds:.1f}s, "
+            f"{self.stored_records} records stored, {self.empty} without new data, "
+            f"{len(self.failed)} failed"
+        )
+
+
+def fetch_last_dates(
+    collection,
+    symbols: Optional[Iterable[str]] = None,
+    symbol_field: str = "symbol",
+    date_field: str = "date",
+) -> Dict[str, str]:
+    """
+    Last stored date of every symbol of a Mongo collection, in one aggregation.
+
+    The ``$max`` date per symbol is taken as the first document of each
+    symbol in descending ``(symbol, date)`` order: the shape MongoDB answers
+    with a ``DISTINCT_SCAN`` of the ``(symbol, date)`` index, one index seek
+    per symbol, instead of a ``find_one`` round trip per symbol.
+    """
+    pipeline = []
+    if symbols is not None:
+        pipeline.append({"$match": {symbol_field: {"$in": list(symbols)}}})
+    pipeline += [
+        {"$sort": {symbol_field: -1, date_field: -1}},
+        {
+            "$group": {
+                "_id": f"${symbol_field}",
+                "last_date": {"$first": f"${date_field}"},
+            }
+        },
+    ]
+    return {
+        row["_id"]: row["last_date"]
+        for row in collection.aggregate(pipeline, allowDiskUse=True)
+        if row["last_date"] is not None
+    }
+
+
+def fetch_last_dates_sqlite(
+    db_path: str,
+    table_name: str = "stock_data",
+    symbol_field: str = "symbol",
+    date_field: str = "date",
+) -> Dict[str, str]:
+    """Last stored date of every symbol of a SQLite table, in one ``GROUP BY``."""
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            f"SELECT {symbol_field}, MAX({date_field}) FROM {table_name} "
+            f"GROUP BY {symbol_field}"
+        ).fetchall()
+    return {
+        symbol: str(last_date) for symbol, last_date in rows if last_date is not None
+    }
+
+
+def next_day(yyyymmdd: str) -> str:
+    return (datetime.strptime(yyyymmdd, "%Y%m%d") + timedelta(days=1)).strftime(
+        "%Y%m%d"
+    )
+
+
+@dataclass
+class SyncPlan:
+    """
+    Split of a sync between the two modes.
+
+    ``watermark`` is the latest stored date of the market; every symbol
+    stored up to it is refreshed date-major after it (``date_major``).
+    Symbols without data, or lagging behind the watermark, are backfilled
+    symbol by symbol over ``backfill[symbol] = (start_date, end_date)``.
+    """
+
+    watermark: Optional[str]
+    date_major: List[str]
+    backfill: Dict[str, Tuple[str, str]]
+
+
+def plan_sync(
+    last_dates: Dict[str, Optional[str]], end_date: str, default_start_date: str
+) -> SyncPlan:
+    """
+    Plan a sync from the ``YYYYMMDD`` last stored date of every symbol (None
+    for symbols without data).
+    """
+    watermark = max(filter(None, last_dates.values()), default=None)
+    date_major, backfill = [], {}
+    for symbol, last_date in last_dates.items():
+        if last_date is None:
+            if default_start_date <= end_date:
+                backfill[symbol] = (default_start_date, end_date)
+            continue
+        date_major.append(symbol)
+        if last_date < watermark:
+            backfill[symbol] = (next_day(last_date), min(watermark, end_date))
+    return SyncPlan(watermark, date_major, backfill)
+
+
+class MarketSync:
+    """
+    Fetch symbols or trading days concurrently and store them as they arrive.
+
+    Parameters
+    ----------
+    pro :
+        Tushare pro client, or anything with compatible ``daily`` and
+        ``trade_cal`` methods.
+    store : Callable[[pd.DataFrame, FetchTask], int]
+        Called in the calling thread with every non-empty frame, returns the
+        number of records stored. Frames of ``run_by_date`` hold a whole
+        trading day: their task has no ``symbol`` and its ``index_component``
+        maps each symbol to its value.
+    calls_per_minute : float
+        Rate of the shared token bucket, keep it under the account quota.
+    workers : int
+        Fetch threads.
+    queue_size : int
+        Fetched frames waiting for ``store`` before the fetchers block.
+    retries, backoff, max_backoff :
+        See ``call_with_retry``.
+    limiter : TokenBucket
+        Overrides ``calls_per_minute``, e.g. to share a bucket between jobs.
+    st_symbols : Iterable[str]
+        ST stocks, flagged with ``FetchTask.is_st`` in the tasks passed to
+        ``store``. See ``load_st_symbols``.
+    """
+
+    def __init__(
+        self,
+        pro,
+        store: Callable[[pd.DataFrame, FetchTask], int],
+        calls_per_minute: float = 450,
+        workers: int = 8,
+        queue_size: int = 32,
+        retries: int = 3,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        limiter: Optional[TokenBucket] = None,
+        fields: Optional[List[str]] = None,
+        st_symbols: Optional[Iterable[str]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.pro = pro
+        self.store = store
+        self.limiter = limiter or TokenBucket.per_minute(calls_per_minute)
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.fields = fields or DAILY_FIELDS
+        self.st_symbols = frozenset(st_symbols or ())
+        self._sleep = sleep
+
+    def _call(self, fn: Callable, **kwargs):
+        return call_with_retry(
+            fn,
+            retries=self.retries,
+            backoff=self.backoff,
+            max_backoff=self.max_backoff,
+            limiter=self.limiter,
+            sleep=self._sleep,
+            **kwargs,
+        )
+
+    def fetch(self, task: FetchTask) -> pd.DataFrame:
+        return self._call(
+            self.pro.daily,
+            ts_code=task.symbol,
+            start_date=task.start_date,
+            end_date=task.end_date,
+            fields=self.fields,
+        )
+
+    def fetch_date(self, trade_date: str) -> pd.DataFrame:
+        """The whole market on one trading day, in a single call."""
+        return self._call(self.pro.daily, trade_date=trade_date, fields=self.fields)
+
+    def trading_days(self, start_date: str, end_date: str) -> List[str]:
+        """Open days of the exchange calendar within ``[start_date, end_date]``."""
+        if start_date > end_date:
+            return []
+        cal = self._call(
+            self.pro.trade_cal,
+            exchange="",
+            start_date=start_date,
+            end_date=end_date,
+            is_open="1",
+        )
+        if "is_open" in cal.columns:
+            cal = cal[cal["is_open"].astype(int) == 1]
+        return sorted(cal["cal_date"].astype(str))
+
+    def load_st_symbols(self) -> frozenset:
+        """
+        Listed stocks whose name marks them as ST, with one ``stock_basic``
+        call; meant to be loaded once per run. Names are the current ones, so
+        backfilled history uses today's ST status.
+        """
+        basic = self._call(
+            self.pro.stock_basic, exchange="", list_status="L", fields="ts_code,name"
+        )
+        names = basic["name"].astype(str).str.upper()
+        self.st_symbols = frozenset(
+            basic.loc[names.str.startswith(ST_NAME_PREFIXES), "ts_code"]
+        )
+        return self.st_symbols
+
+    def _fetch_all(
+        self, items: List[object], fetch: Callable[[object], pd.DataFrame]
+    ) -> Iterator[Tuple[object, Optional[pd.DataFrame], Optional[Exception]]]:
+        """
+        ``fetch`` every item on the pool and yield ``(item, df, error)`` in
+        completion order, through a bounded queue.
+        """
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def _fetch(item):
+            if stop.is_set():
+                return
+            try:
+                result = (item, fetch(item), None)
+            except Exception as e:
+                result = (item, None, e)
+            # a full queue blocks the fetchers until the consumer catches up
+            while not stop.is_set():
+                try:
+                    results.put(result, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        pool = ThreadPoolExecutor(self.workers, thread_name_prefix="tushare-fetch")
+        try:
+            for item in items:
+                pool.submit(_fetch, item)
+            for _ in items:
+                yield results.get()
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def run(self, tasks: Iterable[FetchTask]) -> SyncReport:
+        """Symbol-major sync: one call per symbol, for backfills."""
+        tasks = list(tasks)
+        report = SyncReport(total=len(tasks))
+        start = time.perf_counter()
+        try:
+            with closing(self._fetch_all(tasks, self.fetch)) as results:
+                for i, (task, df, error) in enumerate(results, start=1):
+                    if error is not None:
+                        report.failed[task.symbol] = f"{type(error).__name__}: {error}"
+                        print(f"[{i}/{len(tasks)}] {task.symbol} failed: {error}")
+                        continue
+                    report.fetched += 1
+                    if df is None or df.empty:
+                        report.empty += 1
+                        continue
+                    task = replace(
+                        task, is_st=task.is_st or task.symbol in self.st_symbols
+                    )
+                    stored = self.store(df, task) or 0
+                    report.stored_records += stored
+                    print(f"[{i}/{len(tasks)}] {task.symbol}: {stored} records stored")
+        finally:
+            report.seconds = time.perf_counter() - start
+        return report
+
+    def run_by_date(
+        self,
+        trade_dates: Iterable[str],
+        index_components: Optional[Dict[str, object]] = None,
+    ) -> SyncReport:
+        """
+        Date-major sync: one call per trading day for the whole market, and
+        one ``store`` call per trading day with the rows of every symbol.
+
+        Only the days before the first failed one are stored, so the failed
+        day stays after the latest stored date and the next plan fetches it
+        again; the later days are reported as failed too.
+
+        Parameters
+        ----------
+        trade_dates : Iterable[str]
+            ``YYYYMMDD`` trading days to fetch, e.g. the open days after the
+            latest stored date.
+        index_components : Dict[str, object]
+            ``index_component`` of every symbol to store; symbols missing from
+            it are skipped. None stores every symbol returned.
+
+        Returns
+        -------
+        SyncReport
+            ``total``, ``fetched`` and ``failed`` count trading days, ``failed``
+            includes the days held back.
+        """
+        trade_dates = list(trade_dates)
+        report = SyncReport(total=len(trade_dates))
+        start = time.perf_counter()
+        frames = {}
+        try:
+            with closing(self._fetch_all(trade_dates, self.fetch_date)) as results:
+                for trade_date, df, error in results:
+                    if error is not None:
+                        report.failed[trade_date] = f"{type(error).__name__}: {error}"
+                        print(f"{trade_date} failed: {error}")
+                        continue
+                    report.fetched += 1
+                    if df is None or df.empty:
+                        report.empty += 1
+                        continue
+                    frames[trade_date] = df
+            if report.failed:
+                # the days after a failed one are held back: the next plan starts
+                # from the latest stored date and would never fetch the gap
+                first_failed = min(report.failed)
+                for trade_date in sorted(frames):
+                    if trade_date > first_failed:
+                        del frames[trade_date]
+                        report.failed[trade_date] = f"held back, {first_failed} failed"
+                print(f"days after {first_failed} not stored")
+            if not frames:
+                return report
+            symbols = set()
+            for trade_date in sorted(frames):
+                df = frames[trade_date]
+                if index_components is not None:
+                    df = df[df["ts_code"].isin(list(index_components))]
+                if df.empty:
+                    continue
+                symbols.update(df["ts_code"])
+                task = FetchTask(None, trade_date, trade_date, index_components)
+                report.stored_records += self.store(df, task) or 0
+            print(f"{len(frames)} trading days stored for {len(symbols)} symbols")
+        finally:
+            report.seconds = time.perf_counter() - start
+        return report
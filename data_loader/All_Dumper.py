@@ -1,14 +1,125 @@
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import tempfile
 from functools import partial
+from pathlib import Path
+from typing import List, NamedTuple, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from loguru import logger
 from tqdm import tqdm
 
 from base_dumper import DumpDataBase
+from calendar_index import CalendarIndex
+from dump_manifest import source_fingerprint
+from qlib.utils import code_to_fname
+
+
+class SymbolBlock(NamedTuple):
+    """Compact per-symbol intermediate of the single-pass dump."""
+
+    code: str
+    symbol: str
+    fingerprint: str
+    fields: Tuple[str, ...]
+    dates: np.ndarray
+    values: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.dates.nbytes + self.values.nbytes
 
 
 class DumpDataAll(DumpDataBase):
+    def __init__(
+        self,
+        data_path: str,
+        qlib_dir: str,
+        backup_dir: str = None,
+        freq: str = "day",
+        max_workers: int = 16,
+        date_field_name: str = "date",
+        file_suffix: str = ".csv",
+        symbol_field_name: str = "symbol",
+        exclude_fields: str = "",
+        include_fields: str = "",
+        limit_nums: int = None,
+        table_name: str = None,
+        read_chunksize: int = 200_000,
+        resume: bool = True,
+        executor: str = "auto",
+        chunk_size: int = None,
+        source_cache: bool = False,
+        source_cache_mb: int = 4096,
+        cross_section: bool = False,
+        metrics_path: str = None,
+        single_pass: bool = False,
+        spill_memory_mb: int = 1024,
+        spill_dir: str = None,
+    ):
+        """
+        Parameters
+        ----------
+        data_path : str
+            csv/parquet file or directory, sqlite ``.db`` file, or MongoDB URI
+            (``mongodb://host:27017/panda``) of the ``table_name`` collection.
+            Database sources are streamed symbol by symbol in ordered batches
+            of ``read_chunksize`` rows.
+        source_cache : bool
+            keep the parsed csv/parquet sources as Arrow IPC files in
+            ``.<qlib_dir name>.source_cache`` next to ``qlib_dir``; reruns on
+            unchanged files (same path, size and mtime) memory-map them instead
+            of parsing the csv again.
+        source_cache_mb : int
+            size cap of the source cache, least recently used entries are
+            evicted at the end of the dump.
+        cross_section : bool
+            also write the per-field ``T x N`` matrices of ``CrossSectionStore``
+            in ``qlib_dir/cross_section``; update and fix dumps refresh only the
+            symbols and dates they wrote.
+        metrics_path : str
+            save the stage timers, per-symbol read/parse/merge/write latency
+            histograms, bytes written, peak memory and errors of the job to this
+            file, in the Prometheus text format if it ends with ``.prom``, as
+            JSON otherwise.
+        single_pass : bool
+            parse every source only once: the dates and the dump fields of each
+            symbol are kept as a compact numpy block, the calendar is built from
+            the collected dates and the bins are written from the blocks.
+        spill_memory_mb : int
+            in single-pass mode, the blocks are kept in memory until they exceed
+            this budget; further blocks are spilled to ``.npy`` files and
+            memory-mapped back when the bins are written.
+        spill_dir : str
+            parent directory of the spill files, defaults to the system temp dir.
+        """
+        super().__init__(
+            data_path,
+            qlib_dir,
+            backup_dir,
+            freq,
+            max_workers,
+            date_field_name,
+            file_suffix,
+            symbol_field_name,
+            exclude_fields,
+            include_fields,
+            limit_nums,
+            table_name,
+            read_chunksize,
+            resume,
+            executor,
+            chunk_size,
+            source_cache,
+            source_cache_mb,
+            cross_section,
+            metrics_path,
+        )
+        self.single_pass = single_pass
+        self.spill_memory_bytes = int(spill_memory_mb) * 1024 * 1024
+        self.spill_dir = (
+            spill_dir if spill_dir is None else Path(spill_dir).expanduser()
+        )
+
     def _get_all_date(self):
         logger.info("start get all date......")
         all_datetime = set()
@@ -32,9 +143,9 @@ class DumpDataAll(DumpDataBase):
             logger.info("loading from files......")
             _fun = partial(self._get_date, as_set=True, is_begin_end=True)
             with tqdm(total=len(self.df_files)) as p_bar:
-                with ProcessPoolExecutor(max_workers=self.works) as executor:
+                with self._executor(len(self.df_files)) as executor:
                     for file_path, ((_begin_time, _end_time), _set_calendars) in zip(
-                        self.df_files, executor.map(_fun, self.df_files)
+                        self.df_files, executor.imap(_fun, self.df_files)
                     ):
                         all_datetime.update(_set_calendars)
                         if isinstance(_begin_time, pd.Timestamp) and isinstance(
@@ -58,6 +169,7 @@ class DumpDataAll(DumpDataBase):
         self._calendars_list = sorted(
             map(pd.Timestamp, self._kwargs["all_datetime_set"])
         )
+        self._calendar_index = CalendarIndex(self._calendars_list)
         self.save_calendars(self._calendars_list)
         logger.info("end of calendars dump.\n")
 
@@ -66,19 +178,136 @@ class DumpDataAll(DumpDataBase):
         self.save_instruments(self._kwargs["date_range_list"])
         logger.info("end of instruments dump.\n")
 
-    def _dump_features(self):
-        logger.info("start dump features......")
-        _dump_func = partial(self._dump_bin, calendar_list=self._calendars_list)
+    def _features_dumped(self, manifest):
+        self._save_fingerprints(manifest.fingerprints())
+
+    def _get_symbol_block(self, file_or_data: [Path, pd.DataFrame]) -> SymbolBlock:
+        code, df = self._load_symbol_data(file_or_data)
+        if df is None or df.empty or self.date_field_name not in df.columns:
+            return None
+        df = df.dropna(subset=[self.date_field_name]).drop_duplicates(
+            self.date_field_name
+        )
+        if df.empty:
+            return None
+        if isinstance(file_or_data, pd.DataFrame):
+            symbol = str(df[self.symbol_field_name].iloc[0]).upper()
+        else:
+            symbol = code.upper()
+        fields = tuple(
+            field
+            for field in self.get_dump_fields(df.columns)
+            if field in df.columns and field != self.date_field_name
+        )
+        return SymbolBlock(
+            code=code,
+            symbol=symbol,
+            fingerprint=source_fingerprint(file_or_data),
+            fields=fields,
+            dates=df[self.date_field_name].to_numpy(dtype="datetime64[ns]"),
+            values=df.loc[:, list(fields)].to_numpy(dtype="<f"),
+        )
+
+    @staticmethod
+    def _spill_block(block: SymbolBlock, spill_path: Path) -> SymbolBlock:
+        dates_path = spill_path.with_suffix(".dates.npy")
+        values_path = spill_path.with_suffix(".values.npy")
+        np.save(dates_path, block.dates)
+        np.save(values_path, block.values)
+        return block._replace(
+            dates=np.load(dates_path, mmap_mode="r"),
+            values=np.load(values_path, mmap_mode="r"),
+        )
+
+    def _dump_block(self, block: SymbolBlock, calendar_list: CalendarIndex):
+        df = pd.DataFrame(np.asarray(block.values), columns=list(block.fields))
+        df[self.date_field_name] = np.asarray(block.dates)
+        features_dir = self._features_dir.joinpath(code_to_fname(block.code).lower())
+        features_dir.mkdir(parents=True, exist_ok=True)
+        return self._data_to_bin(df, calendar_list, features_dir)
+
+    def _source_key(self, file_or_data: Union[Path, pd.DataFrame, SymbolBlock]):
+        if isinstance(file_or_data, SymbolBlock):
+            return file_or_data.code, file_or_data.fingerprint
+        return super()._source_key(file_or_data)
+
+    def _dump_bin(
+        self,
+        file_or_data: Union[Path, pd.DataFrame, SymbolBlock],
+        calendar_list: Union[CalendarIndex, List[pd.Timestamp]],
+    ):
+        if isinstance(file_or_data, SymbolBlock):
+            return self._dump_block(file_or_data, calendar_list)
+        return super()._dump_bin(file_or_data, calendar_list)
+
+    def _get_symbol_blocks(self, spill_dir: Path) -> List[SymbolBlock]:
+        """
+        Parse every source once into a ``SymbolBlock`` and collect the dates
+        and instrument ranges of ``_get_all_date`` on the way; blocks past the
+        memory budget are spilled to ``spill_dir``.
+        """
+        logger.info("start single-pass parse......")
         iterable = self.data_groups if self.is_db_source else self.df_files
+        all_datetime = set()
+        date_range_list = []
+        blocks = []
+        in_memory_bytes = 0
+        spilled = 0
         with tqdm(total=len(iterable)) as p_bar:
-            with ThreadPoolExecutor(max_workers=self.works) as executor:
-                for _ in executor.map(_dump_func, iterable):
+            with self._executor(len(iterable)) as executor:
+                for block in executor.imap(self._get_symbol_block, iterable):
                     p_bar.update()
+                    if block is None:
+                        continue
+                    _calendars = pd.DatetimeIndex(block.dates)
+                    all_datetime.update(_calendars)
+                    _begin_time = self._format_datetime(_calendars.min())
+                    _end_time = self._format_datetime(_calendars.max())
+                    date_range_list.append(
+                        self.INSTRUMENTS_SEP.join(
+                            [block.symbol, _begin_time, _end_time]
+                        )
+                    )
+                    if in_memory_bytes + block.nbytes > self.spill_memory_bytes:
+                        block = self._spill_block(
+                            block, spill_dir.joinpath(str(len(blocks)))
+                        )
+                        spilled += 1
+                    else:
+                        in_memory_bytes += block.nbytes
+                    blocks.append(block)
+        logger.info(
+            f"parsed {len(blocks)} symbols, {spilled} spilled to disk, "
+            f"{in_memory_bytes / 1024 / 1024:.1f} MB kept in memory"
+        )
+        self._kwargs["all_datetime_set"] = all_datetime
+        self._kwargs["date_range_list"] = date_range_list
+        logger.info("end of single-pass parse.\n")
+        return blocks
 
-        logger.info("end of features dump.\n")
+    def _dump_single_pass(self):
+        with tempfile.TemporaryDirectory(
+            prefix="qlib_dump_spill_", dir=self.spill_dir
+        ) as spill_dir:
+            with self._metrics.stage("dates"):
+                blocks = self._get_symbol_blocks(Path(spill_dir))
+            with self._metrics.stage("calendars"):
+                self._dump_calendars()
+            with self._metrics.stage("instruments"):
+                self._dump_instruments()
+            with self._metrics.stage("features"):
+                # writing from ready blocks is mostly I/O, threads by default
+                self._dump_features(blocks, cpu_bound=False)
 
     def dump(self):
-        self._get_all_date()
-        self._dump_calendars()
-        self._dump_instruments()
-        self._dump_features()
+        if self.single_pass:
+            self._dump_single_pass()
+            return
+        with self._metrics.stage("dates"):
+            self._get_all_date()
+        with self._metrics.stage("calendars"):
+            self._dump_calendars()
+        with self._metrics.stage("instruments"):
+            self._dump_instruments()
+        with self._metrics.stage("features"):
+            self._dump_features()
@@ -1,15 +1,52 @@
 import abc
+import json
 import shutil
+import time
+from collections import deque
 from pathlib import Path
-from typing import Iterable, List, Union
+from typing import Callable, Dict, Iterable, List, Optional, Union
 
 import numpy as np
 import pandas as pd
 from loguru import logger
-
-from data_loader import read_as_df
+from tqdm import tqdm
+
+from bin_writer import BinWriteStats, write_bin_block
+from calendar_index import CalendarIndex
+from cross_section import CrossSectionStore
+from data_loader import (
+    MongoSymbolSource,
+    SqlSymbolSource,
+    is_mongo_uri,
+    read_as_df,
+    read_columns,
+)
+from date_parser import parse_yyyymmdd
+from dump_executor import DumpExecutor, TaskError
+from dump_manifest import DumpManifest, calendar_fingerprint, source_fingerprint
+from dump_metrics import DumpMetrics
+from source_cache import SourceCache
 from qlib.utils import fname_to_code, code_to_fname
 
+# per-process state of pool workers, installed once by _init_worker
+_WORKER_STATE = {}
+
+
+def _init_worker(dumper: "DumpDataBase", calendar_list=None):
+    _WORKER_STATE["dumper"] = dumper
+    _WORKER_STATE["calendar_list"] = calendar_list
+
+
+def _dump_bin_task(file_or_data, calendar_list=None):
+    """Process-pool task dumping one symbol with the dumper of _init_worker.
+
+    Only the symbol data (and its own calendar, if any) is pickled per task;
+    ``calendar_list=None`` uses the calendar shared at worker start.
+    """
+    if calendar_list is None:
+        calendar_list = _WORKER_STATE["calendar_list"]
+    return _WORKER_STATE["dumper"]._dump_bin(file_or_data, calendar_list)
+
 
 class DumpDataBase(abc.ABC):
     INSTRUMENTS_START_FIELD = "start_datetime"
@@ -22,10 +59,27 @@ class DumpDataBase(abc.ABC):
     HIGH_FREQ_FORMAT = "%Y-%m-%d %H:%M:%S"
     INSTRUMENTS_SEP = "\t"
     INSTRUMENTS_FILE_NAME = "all.txt"
+    MANIFEST_FILE_NAME = ".dump_manifest"
+    FINGERPRINTS_FILE_NAME = ".source_fingerprints"
 
     UPDATE_MODE = "update"
     ALL_MODE = "all"
 
+    # runtime state of the main process (loaded data, calendars, instruments),
+    # not shipped to process workers when the dumper is pickled
+    _PROCESS_LOCAL_ATTRS = (
+        "_all_data",
+        "_kwargs",
+        "_calendars_list",
+        "_calendar_index",
+        "_old_calendar_list",
+        "_new_calendar_list",
+        "_new_calendar_index",
+        "_update_instruments",
+        "_old_instruments",
+        "_metrics",
+    )
+
     def __init__(
         self,
         data_path: str,
@@ -40,6 +94,14 @@ class DumpDataBase(abc.ABC):
         include_fields: str = "",
         limit_nums: int = None,
         table_name: str = None,
+        read_chunksize: int = 200_000,
+        resume: bool = True,
+        executor: str = "auto",
+        chunk_size: int = None,
+        source_cache: bool = False,
+        source_cache_mb: int = 4096,
+        cross_section: bool = False,
+        metrics_path: str = None,
     ):
         data_path_obj = Path(data_path).expanduser()
         if isinstance(exclude_fields, str):
@@ -59,33 +121,39 @@ class DumpDataBase(abc.ABC):
         self.data_groups = []
         self.date_field_name = date_field_name
 
-        if data_path_obj.suffix.lower() == ".db":
+        if is_mongo_uri(data_path) or data_path_obj.suffix.lower() == ".db":
             self.is_db_source = True
-            all_df = read_as_df(data_path_obj, table_name=self.table_name)
-
-            if self.date_field_name in all_df.columns:
-                all_df[self.date_field_name] = pd.to_datetime(
-                    all_df[self.date_field_name].astype(str),
-                    format="%Y%m%d",
-                    errors="coerce",
+            if is_mongo_uri(data_path):
+                self.data_groups = MongoSymbolSource(
+                    data_path,
+                    collection_name=self.table_name,
+                    symbol_field_name=self.symbol_field_name,
+                    date_field_name=self.date_field_name,
+                    batch_size=read_chunksize,
+                    limit_nums=limit_nums,
+                    transform=self._parse_db_chunk,
                 )
-                all_df.dropna(subset=[self.date_field_name], inplace=True)
             else:
+                self.data_groups = SqlSymbolSource(
+                    data_path_obj,
+                    table_name=self.table_name,
+                    symbol_field_name=self.symbol_field_name,
+                    date_field_name=self.date_field_name,
+                    chunksize=read_chunksize,
+                    limit_nums=limit_nums,
+                    transform=self._parse_db_chunk,
+                )
+            db_columns = self.data_groups.columns
+            if self.date_field_name not in db_columns:
                 raise ValueError(
                     f"Date field '{self.date_field_name}' not found in the database table."
                 )
-
-            if self.symbol_field_name not in all_df.columns:
+            if self.symbol_field_name not in db_columns:
                 raise ValueError(
                     f"Symbol field '{self.symbol_field_name}' not found in the database table."
                 )
-            # Use .copy() to avoid potential SettingWithCopyWarning later
-            self.data_groups = [
-                group.copy() for _, group in all_df.groupby(self.symbol_field_name)
-            ]
-            self.df_files = [data_path_obj]
-            if limit_nums is not None:
-                self.data_groups = self.data_groups[: int(limit_nums)]
+            self.data_groups.columns_ = self._source_columns(db_columns)
+            self.df_files = [data_path if is_mongo_uri(data_path) else data_path_obj]
         else:
             self.df_files = sorted(
                 data_path_obj.glob(f"*{self.file_suffix}")
@@ -115,9 +183,50 @@ class DumpDataBase(abc.ABC):
         self._instruments_dir = self.qlib_dir.joinpath(self.INSTRUMENTS_DIR_NAME)
 
         self._calendars_list = []
+        self._calendar_index = None
 
         self._mode = self.ALL_MODE
         self._kwargs = {}
+        self.resume = resume
+        self.executor_backend = executor
+        self.chunk_size = chunk_size
+        self.cross_section = cross_section
+        # stage timers and per-symbol latencies, saved by __call__
+        self.metrics_path = metrics_path
+        self._metrics = DumpMetrics(type(self).__name__)
+        # parsed csv/parquet sources, next to qlib_dir so backups do not copy it
+        self._source_cache = (
+            SourceCache(
+                self.qlib_dir.with_name(f".{self.qlib_dir.name}.source_cache"),
+                max_bytes=int(source_cache_mb) * 1024 * 1024,
+            )
+            if source_cache and not self.is_db_source
+            else None
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in self._PROCESS_LOCAL_ATTRS:
+            if attr in state:
+                state[attr] = None
+        return state
+
+    def _executor(
+        self,
+        n_tasks: Optional[int] = None,
+        cpu_bound: bool = True,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+    ) -> DumpExecutor:
+        return DumpExecutor(
+            self.executor_backend,
+            max_workers=self.works,
+            chunk_size=self.chunk_size,
+            n_tasks=n_tasks,
+            cpu_bound=cpu_bound,
+            initializer=initializer,
+            initargs=initargs,
+        )
 
     def _backup_qlib_dir(self, target_dir: Path):
         shutil.copytree(str(self.qlib_dir.resolve()), str(target_dir.resolve()))
@@ -141,16 +250,7 @@ class DumpDataBase(abc.ABC):
             raise ValueError(f"data is empty or {self.date_field_name} not in columns")
         else:
 
-            date_col = df[self.date_field_name]
-            if pd.api.types.is_datetime64_any_dtype(date_col):
-                _calendars = date_col
-            else:
-                _calendars = pd.to_datetime(
-                    date_col.astype(str),
-                    format="%Y%m%d",
-                    errors="coerce",
-                )
-            _calendars = _calendars.dropna()
+            _calendars = parse_yyyymmdd(df[self.date_field_name]).dropna()
 
         if is_begin_end and as_set:
             return (_calendars.min(), _calendars.max()), set(_calendars)
@@ -161,14 +261,48 @@ class DumpDataBase(abc.ABC):
         else:
             return _calendars.tolist()
 
-    def _get_source_data(self, file_path: Path) -> pd.DataFrame:
-        df = read_as_df(file_path, low_memory=False)
-        if self.date_field_name in df.columns:
+    def _parse_db_chunk(self, df: pd.DataFrame) -> pd.DataFrame:
+        start = time.perf_counter()
+        df[self.date_field_name] = parse_yyyymmdd(df[self.date_field_name])
+        if self._metrics is not None:
+            # db chunks are parsed in the main process, while they are streamed
+            self._metrics.add_stage("parse", time.perf_counter() - start)
+        return df.dropna(subset=[self.date_field_name])
+
+    def _source_columns(self, columns: Iterable[str]) -> Optional[List[str]]:
+        """Columns of a source that the dump needs, None when all of them are."""
+        if not (self._include_fields or self._exclude_fields):
+            return None
+        needed = set(self.get_dump_fields(columns))
+        needed.update((self.symbol_field_name, self.date_field_name))
+        return [column for column in columns if column in needed]
+
+    def _file_source_columns(self, file_path: Path) -> Optional[List[str]]:
+        """``_source_columns`` of a file, its header is only read to project it."""
+        if not (self._include_fields or self._exclude_fields):
+            return None
+        return self._source_columns(read_columns(file_path))
 
-            df[self.date_field_name] = pd.to_datetime(
-                df[self.date_field_name].astype(str), format="%Y%m%d", errors="coerce"
+    def _get_source_data(self, file_path: Path) -> pd.DataFrame:
+        columns = self._file_source_columns(file_path)
+        if self._source_cache is not None:
+            df = self._source_cache.get(
+                file_path, columns=columns, date_field_name=self.date_field_name
             )
+            if df is not None:
+                return df
+        df = read_as_df(file_path, columns=columns, low_memory=False)
+        start = time.perf_counter()
+        if self.date_field_name in df.columns:
+            df[self.date_field_name] = parse_yyyymmdd(df[self.date_field_name])
             df.dropna(subset=[self.date_field_name], inplace=True)
+        parse_seconds = time.perf_counter() - start
+        if self._source_cache is not None:
+            self._source_cache.put(
+                file_path, df, columns=columns, date_field_name=self.date_field_name
+            )
+        # picked up by _dump_bin for the per-symbol metrics
+        df.attrs["parse_seconds"] = parse_seconds
         return df
 
     def get_symbol_from_file(self, file_path: Path) -> str:
@@ -236,61 +370,131 @@ class DumpDataBase(abc.ABC):
             np.savetxt(instruments_path, instruments_data, fmt="%s", encoding="utf-8")
 
     def data_merge_calendar(
-        self, df: pd.DataFrame, calendars_list: List[pd.Timestamp]
+        self, df: pd.DataFrame, calendars_list: Union[CalendarIndex, List[pd.Timestamp]]
     ) -> pd.DataFrame:
-        calendars_df = pd.DataFrame(data=calendars_list, columns=[self.date_field_name])
-        calendars_df[self.date_field_name] = calendars_df[self.date_field_name].astype(
-            "datetime64[ns]"
+        calendar = (
+            calendars_list
+            if isinstance(calendars_list, CalendarIndex)
+            else CalendarIndex(calendars_list)
         )
-        cal_df = calendars_df[
-            (calendars_df[self.date_field_name] >= df[self.date_field_name].min())
-            & (calendars_df[self.date_field_name] <= df[self.date_field_name].max())
+        fields = [
+            field
+            for field in self.get_dump_fields(df.columns)
+            if field in df.columns and field != self.date_field_name
         ]
-        cal_df.set_index(self.date_field_name, inplace=True)
-        df.set_index(self.date_field_name, inplace=True)
-        return df.reindex(cal_df.index)
+        start, values = calendar.align(
+            df[self.date_field_name].to_numpy(dtype="datetime64[ns]"),
+            df.loc[:, fields].to_numpy(dtype="<f"),
+        )
+        index = pd.DatetimeIndex(
+            calendar.values[start : start + len(values)], name=self.date_field_name
+        )
+        return pd.DataFrame(values, index=index, columns=fields, copy=False)
 
     @staticmethod
-    def get_datetime_index(df: pd.DataFrame, calendar_list: List[pd.Timestamp]) -> int:
+    def get_datetime_index(
+        df: pd.DataFrame, calendar_list: Union[CalendarIndex, List[pd.Timestamp]]
+    ) -> int:
+        if isinstance(calendar_list, CalendarIndex):
+            return calendar_list.position(df.index.min())
         return calendar_list.index(df.index.min())
 
     def _data_to_bin(
-        self, df: pd.DataFrame, calendar_list: List[pd.Timestamp], features_dir: Path
+        self,
+        df: pd.DataFrame,
+        calendar_list: Union[CalendarIndex, List[pd.Timestamp]],
+        features_dir: Path,
     ):
         if df.empty:
             logger.warning(f"{features_dir.name} data is None or empty")
             return
-        if not calendar_list:
+        if not len(calendar_list):
             logger.warning("calendar_list is empty")
             return
+        if not isinstance(calendar_list, CalendarIndex):
+            calendar_list = CalendarIndex(calendar_list)
+        start = time.perf_counter()
         _df = self.data_merge_calendar(df, calendar_list)
+        merge_seconds = time.perf_counter() - start
         if _df.empty:
             logger.warning(f"{features_dir.name} data is not in calendars")
             return
         date_index = self.get_datetime_index(_df, calendar_list)
-        for field in self.get_dump_fields(_df.columns):
-            bin_path = features_dir.joinpath(
-                f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}"
+        fields = [
+            field for field in self.get_dump_fields(_df.columns) if field in _df.columns
+        ]
+        bin_paths = [
+            features_dir.joinpath(f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}")
+            for field in fields
+        ]
+        stats = write_bin_block(
+            bin_paths,
+            date_index,
+            _df.loc[:, fields].to_numpy(dtype="<f"),
+            append=[
+                bin_path.exists() and self._mode == self.UPDATE_MODE
+                for bin_path in bin_paths
+            ],
+        )
+        stats.fields = tuple(fields)
+        stats.merge_seconds = merge_seconds
+        return stats
+
+    def _source_code(self, file_or_data: [Path, pd.DataFrame]) -> str:
+        if isinstance(file_or_data, pd.DataFrame):
+            return fname_to_code(
+                str(file_or_data.iloc[0][self.symbol_field_name]).lower()
             )
-            if field not in _df.columns:
-                continue
-            if bin_path.exists() and self._mode == self.UPDATE_MODE:
-                with bin_path.open("ab") as fp:
-                    np.array(_df[field]).astype("<f").tofile(fp)
-            else:
-                np.hstack([date_index, _df[field]]).astype("<f").tofile(
-                    str(bin_path.resolve())
-                )
+        return self.get_symbol_from_file(file_or_data)
 
-    def _dump_bin(
-        self, file_or_data: [Path, pd.DataFrame], calendar_list: List[pd.Timestamp]
-    ):
-        if not calendar_list:
-            logger.warning("calendar_list is empty")
-            return
+    def _source_key(self, file_or_data: [Path, pd.DataFrame]):
+        return self._source_code(file_or_data), source_fingerprint(file_or_data)
+
+    def _begin_symbol(self, manifest: DumpManifest, code: str):
+        manifest.begin(
+            code,
+            self._features_dir.joinpath(code_to_fname(code).lower()),
+            f"*.{self.freq}{self.DUMP_FILE_SUFFIX}",
+        )
+
+    def _fingerprints_path(self) -> Path:
+        return self.qlib_dir.joinpath(f"{self.FINGERPRINTS_FILE_NAME}.{self.freq}.json")
+
+    def _read_fingerprints(self) -> Dict[str, str]:
+        """Source fingerprints of the symbols dumped by the last dump_all/dump_fix."""
+        path = self._fingerprints_path()
+        if not path.exists():
+            return {}
+        with path.open("r", encoding="utf-8") as fp:
+            return json.load(fp)
+
+    def _save_fingerprints(self, fingerprints: Dict[str, str]):
+        path = self._fingerprints_path()
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as fp:
+            json.dump(dict(sorted(fingerprints.items())), fp, indent=0)
+        tmp_path.replace(path)
+
+    def _open_manifest(
+        self, calendar: Union[CalendarIndex, List[pd.Timestamp]]
+    ) -> DumpManifest:
+        self.qlib_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.qlib_dir.joinpath(
+            f"{self.MANIFEST_FILE_NAME}.{type(self).__name__}.{self.freq}.jsonl"
+        )
+        signature = {
+            "dumper": type(self).__name__,
+            "freq": self.freq,
+            "calendar": calendar_fingerprint(calendar),
+            "include_fields": self._include_fields,
+            "exclude_fields": self._exclude_fields,
+        }
+        return DumpManifest(manifest_path, signature, resume=self.resume)
+
+    def _load_symbol_data(self, file_or_data: [Path, pd.DataFrame]):
         if isinstance(file_or_data, pd.DataFrame):
             if file_or_data.empty:
-                return
+                return None, None
             code = fname_to_code(
                 str(file_or_data.iloc[0][self.symbol_field_name]).lower()
             )
@@ -300,19 +504,143 @@ class DumpDataBase(abc.ABC):
             df = self._get_source_data(file_or_data)
         else:
             raise ValueError(f"not support {type(file_or_data)}")
+        return code, df
+
+    def _dump_bin(
+        self,
+        file_or_data: [Path, pd.DataFrame],
+        calendar_list: Union[CalendarIndex, List[pd.Timestamp]],
+    ):
+        if not len(calendar_list):
+            logger.warning("calendar_list is empty")
+            return
+        start = time.perf_counter()
+        code, df = self._load_symbol_data(file_or_data)
+        read_seconds = time.perf_counter() - start
+        if code is None:
+            return
         if df is None or df.empty:
             logger.warning(f"{code} data is None or empty")
             return
+        parse_seconds = df.attrs.get("parse_seconds", 0.0)
 
         df = df.drop_duplicates(self.date_field_name)
 
         features_dir = self._features_dir.joinpath(code_to_fname(code).lower())
         features_dir.mkdir(parents=True, exist_ok=True)
-        self._data_to_bin(df, calendar_list, features_dir)
+        stats = self._data_to_bin(df, calendar_list, features_dir)
+        if stats is not None:
+            stats.read_seconds = read_seconds - parse_seconds
+            stats.parse_seconds = parse_seconds
+        return stats
+
+    def _wants_symbol(self, code: str, fingerprint: str) -> bool:
+        """Whether ``_dump_features`` dumps the symbol, all of them by default."""
+        return True
+
+    def _features_dumped(self, manifest: DumpManifest):
+        """Called by ``_dump_features`` with the manifest of the job before it is dropped."""
+
+    def _dump_features(
+        self, iterable: Optional[Iterable] = None, cpu_bound: bool = True
+    ):
+        """
+        Write the bins of every source symbol on the executor, skipping the
+        symbols ``_wants_symbol`` rejects and those the manifest of an
+        interrupted run already committed.
+
+        ``iterable`` defaults to the sources, subclasses may pass anything their
+        ``_source_key`` and ``_dump_bin`` accept; ``cpu_bound`` picks the
+        executor backend.
+
+        A failing symbol is logged and counted in the metrics without stopping
+        the others, and the manifest is kept so the next run only redoes the
+        failed symbols.
+        """
+        logger.info("start dump features......")
+        if iterable is None:
+            iterable = self.data_groups if self.is_db_source else self.df_files
+        manifest = self._open_manifest(self._calendar_index)
+        write_stats = BinWriteStats()
+        start = time.perf_counter()
+        todo_keys = deque()
+        error_code = {}
+        try:
+            with tqdm(total=len(iterable)) as p_bar:
+
+                def _todo():
+                    for item in iterable:
+                        key = self._source_key(item)
+                        if not self._wants_symbol(*key) or manifest.is_done(*key):
+                            p_bar.update()
+                            continue
+                        todo_keys.append(key)
+                        yield item
+
+                with self._executor(
+                    len(iterable),
+                    cpu_bound=cpu_bound,
+                    initializer=_init_worker,
+                    initargs=(self, self._calendar_index),
+                ) as executor:
+                    for _stats in executor.imap(
+                        _dump_bin_task, _todo(), return_exceptions=True
+                    ):
+                        code, fingerprint = todo_keys.popleft()
+                        if isinstance(_stats, TaskError):
+                            error_code[code] = _stats.traceback
+                            self._metrics.record_error(code, _stats.traceback)
+                        else:
+                            self._metrics.record_symbol(code, _stats)
+                            manifest.commit(
+                                code, fingerprint, getattr(_stats, "fields", ())
+                            )
+                            write_stats += _stats
+                        p_bar.update()
+        except BaseException:
+            manifest.close()
+            raise
+        self._features_dumped(manifest)
+        logger.info(write_stats.summary(time.perf_counter() - start))
+        if error_code:
+            logger.error(f"{len(error_code)} symbols failed: {sorted(error_code)}")
+            manifest.close()
+        else:
+            manifest.finish()
+        logger.info("end of features dump.\n")
+
+    def _cross_section_targets(self) -> Optional[Dict[str, int]]:
+        """Symbols to refresh in the cross-section store and their first calendar row, None for all."""
+        return None
+
+    def _dump_cross_section(self):
+        fields = {
+            bin_path.name.split(".")[0]
+            for bin_path in self._features_dir.glob(
+                f"*/*.{self.freq}{self.DUMP_FILE_SUFFIX}"
+            )
+        }
+        CrossSectionStore(self.qlib_dir, self.freq).sync(
+            fields, self._cross_section_targets()
+        )
 
     @abc.abstractmethod
     def dump(self):
         raise NotImplementedError("dump not implemented!")
 
     def __call__(self, *args, **kwargs):
-        self.dump()
+        try:
+            with self._metrics.stage("dump"):
+                self.dump()
+            if self.cross_section:
+                with self._metrics.stage("cross_section"):
+                    self._dump_cross_section()
+            if self._source_cache is not None:
+                self._source_cache.evict()
+            self._metrics.success = not self._metrics.errors
+        except BaseException:
+            self._metrics.success = False
+            raise
+        finally:
+            if self.metrics_path is not None:
+                self._metrics.save(self.metrics_path)
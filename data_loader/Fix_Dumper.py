@@ -1,4 +1,3 @@
-from concurrent.futures import ProcessPoolExecutor
 from functools import partial
 
 import pandas as pd
@@ -6,19 +5,99 @@ from loguru import logger
 from tqdm import tqdm
 
 from all_dumper import DumpDataAll
+from calendar_index import CalendarIndex
 
 
 class DumpDataFix(DumpDataAll):
+    _PROCESS_LOCAL_ATTRS = DumpDataAll._PROCESS_LOCAL_ATTRS + (
+        "_fingerprints",
+        "_fix_symbols",
+    )
+
+    def __init__(
+        self,
+        data_path: str,
+        qlib_dir: str,
+        backup_dir: str = None,
+        freq: str = "day",
+        max_workers: int = 16,
+        date_field_name: str = "date",
+        file_suffix: str = ".csv",
+        symbol_field_name: str = "symbol",
+        exclude_fields: str = "",
+        include_fields: str = "",
+        limit_nums: int = None,
+        table_name: str = None,
+        read_chunksize: int = 200_000,
+        resume: bool = True,
+        executor: str = "auto",
+        chunk_size: int = None,
+        source_cache: bool = False,
+        source_cache_mb: int = 4096,
+        cross_section: bool = False,
+        metrics_path: str = None,
+        dump_changed: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        dump_changed : bool
+            besides the symbols missing from the instruments, also re-dump the
+            symbols whose source fingerprint (size and mtime of a file, content
+            hash of a table group) differs from the one recorded by the last
+            dump_all/dump_fix. Symbols without a recorded fingerprint count as
+            changed. By default only the new symbols are dumped.
+        """
+        super().__init__(
+            data_path,
+            qlib_dir,
+            backup_dir,
+            freq,
+            max_workers,
+            date_field_name,
+            file_suffix,
+            symbol_field_name,
+            exclude_fields,
+            include_fields,
+            limit_nums,
+            table_name,
+            read_chunksize,
+            resume,
+            executor,
+            chunk_size,
+            source_cache,
+            source_cache_mb,
+            cross_section,
+            metrics_path,
+        )
+        self.dump_changed = dump_changed
+        self._fingerprints = {}
+        self._fix_symbols = set()
+
+    def _is_fix_target(self, code: str, fingerprint: str) -> bool:
+        if code.upper() not in self._old_instruments:
+            return True
+        return self.dump_changed and self._fingerprints.get(code) != fingerprint
+
+    def _wants_symbol(self, code: str, fingerprint: str) -> bool:
+        return code in self._fix_symbols
+
+    def _cross_section_targets(self):
+        return {code.upper(): 0 for code in self._fix_symbols}
+
+    def _save_fingerprints(self, fingerprints):
+        # the symbols left untouched keep their previous fingerprint
+        super()._save_fingerprints({**self._fingerprints, **fingerprints})
+
     def _dump_instruments(self):
         logger.info("start dump instruments......")
         if self.is_db_source:
-            new_stocks_data = list(
-                filter(
-                    lambda df: str(df[self.symbol_field_name].iloc[0]).upper()
-                    not in self._old_instruments,
-                    self.data_groups,
-                )
-            )
+            new_stocks_data = []
+            for df in self.data_groups:
+                code, fingerprint = self._source_key(df)
+                if self._is_fix_target(code, fingerprint):
+                    self._fix_symbols.add(code)
+                    new_stocks_data.append(df)
             with tqdm(total=len(new_stocks_data)) as p_bar:
                 for df_group in new_stocks_data:
                     _begin_time, _end_time = self._get_date(df_group, is_begin_end=True)
@@ -36,17 +115,17 @@ class DumpDataFix(DumpDataAll):
                     p_bar.update()
         else:
             _fun = partial(self._get_date, is_begin_end=True)
-            new_stock_files = sorted(
-                filter(
-                    lambda x: self.get_symbol_from_file(x).upper()
-                    not in self._old_instruments,
-                    self.df_files,
-                )
-            )
+            new_stock_files = []
+            for file_path in self.df_files:
+                code, fingerprint = self._source_key(file_path)
+                if self._is_fix_target(code, fingerprint):
+                    self._fix_symbols.add(code)
+                    new_stock_files.append(file_path)
+            new_stock_files.sort()
             with tqdm(total=len(new_stock_files)) as p_bar:
-                with ProcessPoolExecutor(max_workers=self.works) as execute:
+                with self._executor(len(new_stock_files)) as executor:
                     for file_path, (_begin_time, _end_time) in zip(
-                        new_stock_files, execute.map(_fun, new_stock_files)
+                        new_stock_files, executor.imap(_fun, new_stock_files)
                     ):
                         if isinstance(_begin_time, pd.Timestamp) and isinstance(
                             _end_time, pd.Timestamp
@@ -60,6 +139,10 @@ class DumpDataFix(DumpDataAll):
                                 _end_time
                             )
                         p_bar.update()
+        logger.info(
+            f"{len(self._fix_symbols)} new or changed symbols to dump, "
+            f"{len(self._old_instruments) - len(self._fix_symbols)} left untouched"
+        )
         _inst_df = pd.DataFrame.from_dict(self._old_instruments, orient="index")
         _inst_df.index.names = [self.symbol_field_name]
         self.save_instruments(_inst_df.reset_index())
@@ -69,6 +152,10 @@ class DumpDataFix(DumpDataAll):
         self._calendars_list = self._read_calendars(
             self._calendars_dir.joinpath(f"{self.freq}.txt")
         )
+        self._calendar_index = CalendarIndex(self._calendars_list)
+        # read even without dump_changed: the saved file keeps the untouched symbols
+        self._fingerprints = self._read_fingerprints()
+        self._fix_symbols = set()
         self._old_instruments = (
             self._read_instruments(
                 self._instruments_dir.joinpath(self.INSTRUMENTS_FILE_NAME)
@@ -76,5 +163,7 @@ class DumpDataFix(DumpDataAll):
             .set_index([self.symbol_field_name])
             .to_dict(orient="index")
         )
-        self._dump_instruments()
-        self._dump_features()
+        with self._metrics.stage("instruments"):
+            self._dump_instruments()
+        with self._metrics.stage("features"):
+            self._dump_features()
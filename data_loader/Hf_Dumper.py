@@ -0,0 +1,296 @@
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from tqdm import tqdm
+
+from base_dumper import DumpDataBase
+from bin_writer import BinWriteStats, write_bin_block
+from calendar_index import CalendarIndex
+from data_loader import read_in_chunks
+from date_parser import parse_timestamps
+from qlib.utils import code_to_fname, fname_to_code
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+# calendar lines formatted and written per block
+CALENDAR_WRITE_ROWS = 100_000
+
+
+class _SymbolBinStream:
+    """
+    Append the trading-day blocks of one symbol to its bins.
+
+    The first block starts the files at its first calendar position, later
+    blocks are appended with ``NaN`` for the calendar dates in between, so
+    only one block is in memory at a time.
+    """
+
+    def __init__(self, calendar: np.ndarray, bin_paths: Sequence[Path]):
+        self.calendar = calendar
+        self.bin_paths = list(bin_paths)
+        self.next_pos = None
+        self.dropped = 0
+        self.stats = BinWriteStats()
+
+    def write(self, timestamps: np.ndarray, values: np.ndarray):
+        """``timestamps``: sorted, unique epoch nanoseconds of the ``values`` rows."""
+        pos = np.searchsorted(self.calendar, timestamps)
+        valid = pos < len(self.calendar)
+        valid[valid] = self.calendar[pos[valid]] == timestamps[valid]
+        if self.next_pos is not None:
+            # rows before the last written one: the source is out of order
+            valid &= pos >= self.next_pos
+        self.dropped += int(len(valid) - valid.sum())
+        pos, values = pos[valid], values[valid]
+        if not len(pos):
+            return
+        start = int(pos[0]) if self.next_pos is None else self.next_pos
+        block = np.full((pos[-1] + 1 - start, values.shape[1]), np.nan, dtype="<f")
+        block[pos - start] = values
+        self.stats += write_bin_block(
+            self.bin_paths,
+            start,
+            block,
+            append=None if self.next_pos is None else [True] * len(self.bin_paths),
+        )
+        self.next_pos = int(pos[-1]) + 1
+
+
+class DumpDataHighFreq(DumpDataBase):
+    """
+    Full dump of intraday (e.g. ``1min``) data in bounded memory.
+
+    Minute calendars have millions of entries, so the calendar is an
+    ``int64`` epoch-nanosecond array merged with ``np.union1d`` instead of a
+    set of Timestamps, and it is written to ``calendars/<freq>.txt`` a block
+    at a time. The sources are read ``read_chunksize`` rows at a time; every
+    chunk is cut at its last complete trading day and the whole days are
+    aligned to the calendar and appended to the bins, the trailing day being
+    carried over to the next chunk. Memory per worker is bounded by the chunk
+    size, not by the history of a symbol.
+
+    Timestamps are parsed by ``parse_timestamps``: datetime strings, or
+    ``YYYYMMDDHHMMSS`` / ``YYYYMMDDHHMM`` integers.
+    """
+
+    def __init__(
+        self,
+        data_path: str,
+        qlib_dir: str,
+        backup_dir: str = None,
+        freq: str = "1min",
+        max_workers: int = 16,
+        date_field_name: str = "date",
+        file_suffix: str = ".csv",
+        symbol_field_name: str = "symbol",
+        exclude_fields: str = "",
+        include_fields: str = "",
+        limit_nums: int = None,
+        table_name: str = None,
+        read_chunksize: int = 200_000,
+        resume: bool = True,
+        executor: str = "auto",
+        chunk_size: int = None,
+        cross_section: bool = False,
+        metrics_path: str = None,
+    ):
+        """
+        Parameters
+        ----------
+        read_chunksize : int
+            rows read from a source at a time, the memory bound of a worker.
+            Sqlite sources are streamed symbol by symbol and each symbol is cut
+            in blocks of this size.
+        """
+        super().__init__(
+            data_path,
+            qlib_dir,
+            backup_dir,
+            freq,
+            max_workers,
+            date_field_name,
+            file_suffix,
+            symbol_field_name,
+            exclude_fields,
+            include_fields,
+            limit_nums,
+            table_name,
+            read_chunksize,
+            resume,
+            executor,
+            chunk_size,
+            cross_section=cross_section,
+            metrics_path=metrics_path,
+        )
+        self.read_chunksize = int(read_chunksize)
+
+    def _parse_db_chunk(self, df: pd.DataFrame) -> pd.DataFrame:
+        start = time.perf_counter()
+        df[self.date_field_name] = parse_timestamps(df[self.date_field_name])
+        if self._metrics is not None:
+            self._metrics.add_stage("parse", time.perf_counter() - start)
+        return df.dropna(subset=[self.date_field_name])
+
+    def _symbol_of(self, file_or_data) -> Tuple[str, str]:
+        if isinstance(file_or_data, pd.DataFrame):
+            symbol = str(file_or_data[self.symbol_field_name].iloc[0])
+            return fname_to_code(symbol.lower()), symbol.upper()
+        code = self.get_symbol_from_file(file_or_data)
+        return code, code.upper()
+
+    def _iter_source_chunks(
+        self, file_or_data, columns: Optional[List[str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Chunks of parsed rows of a source, without the rows missing a timestamp."""
+        if isinstance(file_or_data, pd.DataFrame):
+            # db groups are parsed by _parse_db_chunk while they are streamed
+            for start in range(0, len(file_or_data), self.read_chunksize):
+                yield file_or_data.iloc[start : start + self.read_chunksize]
+            return
+        if columns is None:
+            columns = self._file_source_columns(file_or_data)
+        for chunk in read_in_chunks(file_or_data, self.read_chunksize, columns):
+            chunk[self.date_field_name] = parse_timestamps(chunk[self.date_field_name])
+            yield chunk.dropna(subset=[self.date_field_name])
+
+    def _epoch(self, df: pd.DataFrame) -> np.ndarray:
+        return df[self.date_field_name].to_numpy(dtype="datetime64[ns]").view("i8")
+
+    def _scan_timestamps(self, file_or_data) -> Tuple[str, np.ndarray]:
+        """Symbol and sorted unique epoch timestamps of a source."""
+        _, symbol = self._symbol_of(file_or_data)
+        uniques = [
+            np.unique(self._epoch(chunk))
+            for chunk in self._iter_source_chunks(
+                file_or_data, columns=[self.date_field_name]
+            )
+        ]
+        if not uniques:
+            return symbol, np.empty(0, dtype=np.int64)
+        return symbol, np.unique(np.concatenate(uniques))
+
+    def _iter_scans(self) -> Iterator[Tuple[str, np.ndarray]]:
+        if self.is_db_source:
+            # the calendar pass only needs the symbol and the timestamp columns
+            columns, self.data_groups.columns_ = self.data_groups.columns_, [
+                self.symbol_field_name,
+                self.date_field_name,
+            ]
+            try:
+                yield from map(self._scan_timestamps, self.data_groups)
+            finally:
+                self.data_groups.columns_ = columns
+            return
+        with self._executor(len(self.df_files)) as executor:
+            yield from executor.imap(self._scan_timestamps, self.df_files)
+
+    def _dump_calendars_and_instruments(self):
+        logger.info("start dump calendars and instruments......")
+        calendar = np.empty(0, dtype=np.int64)
+        date_range_list = []
+        iterable = self.data_groups if self.is_db_source else self.df_files
+        with tqdm(total=len(iterable)) as p_bar:
+            for symbol, timestamps in self._iter_scans():
+                p_bar.update()
+                if not len(timestamps):
+                    continue
+                calendar = np.union1d(calendar, timestamps)
+                _begin_time, _end_time = pd.DatetimeIndex(
+                    timestamps[[0, -1]].view("datetime64[ns]")
+                ).strftime(self.calendar_format)
+                date_range_list.append(
+                    self.INSTRUMENTS_SEP.join([symbol, _begin_time, _end_time])
+                )
+        self._calendar_index = CalendarIndex(calendar.view("datetime64[ns]"))
+        self.save_calendars(self._calendar_index)
+        self.save_instruments(date_range_list)
+        logger.info(
+            f"{len(calendar)} timestamps, {len(date_range_list)} instruments.\n"
+        )
+
+    def save_calendars(self, calendars_data):
+        self._calendars_dir.mkdir(parents=True, exist_ok=True)
+        calendars_path = self._calendars_dir.joinpath(f"{self.freq}.txt")
+        values = np.asarray(
+            getattr(calendars_data, "values", calendars_data), dtype="datetime64[ns]"
+        )
+        with calendars_path.open("w", encoding="utf-8") as fp:
+            for start in range(0, len(values), CALENDAR_WRITE_ROWS):
+                block = pd.DatetimeIndex(values[start : start + CALENDAR_WRITE_ROWS])
+                fp.write("\n".join(block.strftime(self.calendar_format)) + "\n")
+
+    def _write_block(self, stream: _SymbolBinStream, df: pd.DataFrame, fields):
+        timestamps = self._epoch(df)
+        order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+        # first row of every duplicated timestamp, like drop_duplicates
+        first = np.ones(len(timestamps), dtype=bool)
+        first[1:] = timestamps[1:] != timestamps[:-1]
+        values = df.loc[:, fields].to_numpy(dtype="<f")[order]
+        stream.write(timestamps[first], values[first])
+
+    def _dump_bin(self, file_or_data, calendar_list: CalendarIndex):
+        if not len(calendar_list):
+            logger.warning("calendar_list is empty")
+            return
+        start = time.perf_counter()
+        code, _ = self._symbol_of(file_or_data)
+        features_dir = self._features_dir.joinpath(code_to_fname(code).lower())
+        calendar = calendar_list.values.view("i8")
+        stream, fields, carry = None, None, None
+        merge_seconds = 0.0
+        for chunk in self._iter_source_chunks(file_or_data):
+            if chunk.empty:
+                continue
+            if stream is None:
+                fields = [
+                    field
+                    for field in self.get_dump_fields(chunk.columns)
+                    if field in chunk.columns
+                    and field not in (self.date_field_name, self.symbol_field_name)
+                ]
+                features_dir.mkdir(parents=True, exist_ok=True)
+                stream = _SymbolBinStream(
+                    calendar,
+                    [
+                        features_dir.joinpath(
+                            f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}"
+                        )
+                        for field in fields
+                    ],
+                )
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            # the last trading day of the chunk may go on in the next one
+            days = self._epoch(chunk) // NS_PER_DAY
+            last_day = days == days.max()
+            carry = chunk[last_day]
+            if not last_day.all():
+                merge_start = time.perf_counter()
+                self._write_block(stream, chunk[~last_day], fields)
+                merge_seconds += time.perf_counter() - merge_start
+        if stream is None:
+            logger.warning(f"{code} data is None or empty")
+            return
+        merge_start = time.perf_counter()
+        self._write_block(stream, carry, fields)
+        merge_seconds += time.perf_counter() - merge_start
+        if stream.dropped:
+            logger.warning(
+                f"{code}: {stream.dropped} rows out of order or off the calendar dropped"
+            )
+        stats = stream.stats
+        stats.fields = tuple(fields)
+        # the block writes are timed by write_bin_block, the rest is alignment
+        stats.merge_seconds = max(merge_seconds - stats.seconds, 0.0)
+        stats.read_seconds = time.perf_counter() - start - merge_seconds
+        return stats
+
+    def dump(self):
+        with self._metrics.stage("calendars"):
+            self._dump_calendars_and_instruments()
+        with self._metrics.stage("features"):
+            self._dump_features()
@@ -0,0 +1,150 @@
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from tqdm import tqdm
+
+from base_dumper import DumpDataBase, _WORKER_STATE, _init_worker
+from bin_writer import BinWriteStats, patch_bin_block
+from calendar_index import CalendarIndex
+from dump_executor import TaskError
+from qlib.utils import code_to_fname
+
+
+def _patch_symbol_task(file_or_data):
+    return _WORKER_STATE["dumper"]._patch_symbol(
+        file_or_data, _WORKER_STATE["calendar_list"]
+    )
+
+
+class DumpDataPatch(DumpDataBase):
+    """
+    Patch a date range of an existing qlib dir in place, e.g. after a vendor
+    corrected historical bars.
+
+    Only the rows of the source are written into the existing bins, which are
+    memory-mapped and extended only when a patch goes past their last date.
+    The calendar is left as is: source dates outside of it are dropped.
+    Instrument ranges are widened when a patch covers dates outside of them,
+    and unknown symbols are added.
+    """
+
+    def _patch_symbol(self, file_or_data, calendar: CalendarIndex):
+        read_start = time.perf_counter()
+        code, df = self._load_symbol_data(file_or_data)
+        read_seconds = time.perf_counter() - read_start
+        if code is None or df is None or df.empty:
+            return None
+        parse_seconds = df.attrs.get("parse_seconds", 0.0)
+        df = df.dropna(subset=[self.date_field_name]).drop_duplicates(
+            self.date_field_name, keep="last"
+        )
+        dates = df[self.date_field_name].to_numpy(dtype="datetime64[ns]")
+        calendar = calendar.values
+        positions = np.searchsorted(calendar, dates)
+        valid = positions < len(calendar)
+        valid[valid] = calendar[positions[valid]] == dates[valid]
+        if not valid.all():
+            logger.warning(
+                f"{code}: {int((~valid).sum())} rows dated outside the calendar are skipped"
+            )
+        if not valid.any():
+            return None
+        order = np.argsort(positions[valid], kind="stable")
+        fields = [
+            field
+            for field in self.get_dump_fields(df.columns)
+            if field in df.columns and field != self.date_field_name
+        ]
+        features_dir = self._features_dir.joinpath(code_to_fname(code).lower())
+        features_dir.mkdir(parents=True, exist_ok=True)
+        stats = patch_bin_block(
+            [
+                features_dir.joinpath(
+                    f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}"
+                )
+                for field in fields
+            ],
+            positions[valid][order],
+            df.loc[:, fields].to_numpy(dtype="<f")[valid][order],
+        )
+        stats.fields = tuple(fields)
+        stats.read_seconds = read_seconds - parse_seconds
+        stats.parse_seconds = parse_seconds
+        patched = dates[valid]
+        return code, pd.Timestamp(patched.min()), pd.Timestamp(patched.max()), stats
+
+    def _cross_section_targets(self):
+        return {symbol: 0 for symbol in self._patched_symbols}
+
+    def _patch_instruments(self, ranges: dict):
+        instruments = (
+            self._read_instruments(
+                self._instruments_dir.joinpath(self.INSTRUMENTS_FILE_NAME)
+            )
+            .set_index([self.symbol_field_name])
+            .to_dict(orient="index")
+        )
+        grown = 0
+        for symbol, (_start, _end) in ranges.items():
+            _dt_map = instruments.setdefault(symbol, dict())
+            old_start = _dt_map.get(self.INSTRUMENTS_START_FIELD)
+            old_end = _dt_map.get(self.INSTRUMENTS_END_FIELD)
+            if old_start is None or _start < pd.Timestamp(old_start):
+                _dt_map[self.INSTRUMENTS_START_FIELD] = self._format_datetime(_start)
+                grown += 1
+            if old_end is None or _end > pd.Timestamp(old_end):
+                _dt_map[self.INSTRUMENTS_END_FIELD] = self._format_datetime(_end)
+                grown += 1
+        if grown:
+            _inst_df = pd.DataFrame.from_dict(instruments, orient="index")
+            _inst_df.index.names = [self.symbol_field_name]
+            self.save_instruments(_inst_df.reset_index())
+        logger.info(f"{grown} instrument bounds widened")
+
+    def dump(self):
+        self._calendars_list = self._read_calendars(
+            self._calendars_dir.joinpath(f"{self.freq}.txt")
+        )
+        self._calendar_index = CalendarIndex(self._calendars_list)
+        iterable = self.data_groups if self.is_db_source else self.df_files
+        ranges = {}
+        codes = deque()
+        error_code = {}
+        write_stats = BinWriteStats()
+        start = time.perf_counter()
+        logger.info("start patch features......")
+        with self._metrics.stage("features"), tqdm(total=len(iterable)) as p_bar:
+            with self._executor(
+                len(iterable),
+                initializer=_init_worker,
+                initargs=(self, self._calendar_index),
+            ) as executor:
+
+                def _items():
+                    for item in iterable:
+                        codes.append(self._source_code(item))
+                        yield item
+
+                for result in executor.imap(
+                    _patch_symbol_task, _items(), return_exceptions=True
+                ):
+                    _code = codes.popleft()
+                    if isinstance(result, TaskError):
+                        error_code[_code] = result.traceback
+                        self._metrics.record_error(_code, result.traceback)
+                    elif result is not None:
+                        code, _start, _end, _stats = result
+                        ranges[code.upper()] = (_start, _end)
+                        write_stats += _stats
+                        self._metrics.record_symbol(code, _stats)
+                    p_bar.update()
+        logger.info(write_stats.summary(time.perf_counter() - start))
+        if error_code:
+            logger.error(f"{len(error_code)} symbols failed: {sorted(error_code)}")
+        with self._metrics.stage("instruments"):
+            self._patch_instruments(ranges)
+        self._patched_symbols = list(ranges)
+        logger.info("end of patch.\n")
@@ -1,5 +1,4 @@
-import traceback
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import time
 from pathlib import Path
 
 import numpy as np
@@ -7,8 +6,13 @@ import pandas as pd
 from loguru import logger
 from tqdm import tqdm
 
-from base_dumper import DumpDataBase
-from data_loader import read_as_df
+from base_dumper import DumpDataBase, _dump_bin_task, _init_worker
+from bin_writer import BinWriteStats
+from calendar_index import CalendarIndex
+from data_loader import SymbolPartitions, read_after
+from date_parser import parse_yyyymmdd
+from dump_executor import TaskError
+from dump_manifest import source_fingerprint
 from qlib.utils import fname_to_code
 
 
@@ -27,6 +31,12 @@ class DumpDataUpdate(DumpDataBase):
         include_fields: str = "",
         limit_nums: int = None,
         table_name: str = None,
+        read_chunksize: int = 200_000,
+        resume: bool = True,
+        executor: str = "auto",
+        chunk_size: int = None,
+        cross_section: bool = False,
+        metrics_path: str = None,
     ):
         super().__init__(
             data_path,
@@ -41,8 +51,15 @@ class DumpDataUpdate(DumpDataBase):
             include_fields,
             limit_nums,
             table_name,
+            read_chunksize,
+            resume,
+            executor,
+            chunk_size,
+            cross_section=cross_section,
+            metrics_path=metrics_path,
         )
         self._mode = self.UPDATE_MODE
+        self._cross_section_rows = {}
         self._old_calendar_list = self._read_calendars(
             self._calendars_dir.joinpath(f"{self.freq}.txt")
         )
@@ -54,99 +71,171 @@ class DumpDataUpdate(DumpDataBase):
             .to_dict(orient="index")
         )
 
-        self._all_data = self._load_all_source_data()
+        with self._metrics.stage("load"):
+            self._all_data = self._load_all_source_data()
         self._new_calendar_list = self._old_calendar_list + sorted(
             filter(
                 lambda x: x > self._old_calendar_list[-1],
-                self._all_data[self.date_field_name].unique(),
+                self._all_data.frame[self.date_field_name].unique(),
             )
         )
+        self._new_calendar_index = CalendarIndex(self._new_calendar_list)
+
+    def _get_watermark(self, symbol: str):
+        _code = fname_to_code(str(symbol).lower()).upper()
+        _dt_range = self._update_instruments.get(_code)
+        return None if _dt_range is None else _dt_range[self.INSTRUMENTS_END_FIELD]
+
+    def _track_cross_section(self, code: str):
+        # called before the instrument range moves: copy from the first date
+        # after the previous end, new symbols are copied whole
+        old_end = self._update_instruments.get(code, {}).get(self.INSTRUMENTS_END_FIELD)
+        self._cross_section_rows[code] = (
+            0
+            if old_end is None
+            else self._new_calendar_index.slice_range(old_end, old_end)[1]
+        )
+
+    def _cross_section_targets(self):
+        return self._cross_section_rows
+
+    def _read_source_after(self, file_path: Path, watermark=None) -> pd.DataFrame:
+        _df = read_after(
+            file_path,
+            self.date_field_name,
+            watermark,
+            columns=self._file_source_columns(file_path),
+        )
+        if self.date_field_name in _df.columns and not np.issubdtype(
+            _df[self.date_field_name].dtype, np.datetime64
+        ):
+            if pd.api.types.is_integer_dtype(_df[self.date_field_name]):
+                _df[self.date_field_name] = parse_yyyymmdd(_df[self.date_field_name])
+            else:
+                _df[self.date_field_name] = pd.to_datetime(_df[self.date_field_name])
+        if self.symbol_field_name not in _df.columns:
+            _df[self.symbol_field_name] = self.get_symbol_from_file(file_path)
+        return _df
 
     def _load_all_source_data(self):
         logger.info("start load all source data....")
         if self.is_db_source:
-            logger.info("loading from db groups in memory....")
-            df = pd.concat(self.data_groups, sort=False)
+            logger.info("loading rows after the instruments end dates from db....")
+            watermarks = {}
+            for symbol in self.data_groups.symbols():
+                _watermark = self._get_watermark(symbol)
+                if _watermark is not None:
+                    watermarks[symbol] = _watermark
+            self.data_groups.watermarks = watermarks
+            # already ordered by symbol and date: partitioned without a sort
+            partitions = self.data_groups.partitions()
             logger.info("end of load all data.\n")
-            return df
+            return partitions
         all_df = []
-
-        def _read_df(file_path: Path):
-            _df = read_as_df(file_path)
-            if self.date_field_name in _df.columns and not np.issubdtype(
-                _df[self.date_field_name].dtype, np.datetime64
-            ):
-                _df[self.date_field_name] = pd.to_datetime(_df[self.date_field_name])
-            if self.symbol_field_name not in _df.columns:
-                _df[self.symbol_field_name] = self.get_symbol_from_file(file_path)
-            return _df
-
-        with tqdm(total=len(self.df_files)) as p_bar:
-            with ThreadPoolExecutor(max_workers=self.works) as executor:
-                for df in executor.map(_read_df, self.df_files):
+        tasks = [
+            (file_path, self._get_watermark(self.get_symbol_from_file(file_path)))
+            for file_path in self.df_files
+        ]
+        with tqdm(total=len(tasks)) as p_bar:
+            # tail reads are mostly I/O, threads by default
+            with self._executor(len(tasks), cpu_bound=False) as executor:
+                for df in executor.starmap(self._read_source_after, tasks):
                     if not df.empty:
                         all_df.append(df)
                     p_bar.update()
 
         logger.info("end of load all data.\n")
-        return pd.concat(all_df, sort=False)
+        return SymbolPartitions.from_frames(
+            all_df, self.symbol_field_name, self.date_field_name
+        )
 
     def _dump_features(self):
         logger.info("start dump features......")
         error_code = {}
-        with ProcessPoolExecutor(max_workers=self.works) as executor:
-            futures = {}
-            for _code, _df in self._all_data.groupby(
-                self.symbol_field_name, group_keys=False
+        write_stats = BinWriteStats()
+        start = time.perf_counter()
+        manifest = self._open_manifest(self._new_calendar_index)
+        skipped = 0
+        tasks = []
+        for _code, _df in self._all_data:
+            _code = fname_to_code(str(_code).lower()).upper()
+            _start, _end = self._get_date(_df, is_begin_end=True)
+            if not (
+                isinstance(_start, pd.Timestamp) and isinstance(_end, pd.Timestamp)
             ):
-                _code = fname_to_code(str(_code).lower()).upper()
-                _start, _end = self._get_date(_df, is_begin_end=True)
-                if not (
-                    isinstance(_start, pd.Timestamp) and isinstance(_end, pd.Timestamp)
-                ):
+                continue
+            fingerprint = source_fingerprint(_df)
+            if _code in self._update_instruments:
+                _update_calendars = (
+                    _df[
+                        _df[self.date_field_name]
+                        > self._update_instruments[_code][self.INSTRUMENTS_END_FIELD]
+                    ][self.date_field_name]
+                    .sort_values()
+                    .to_list()
+                )
+                if not _update_calendars:
                     continue
-                if _code in self._update_instruments:
-                    _update_calendars = (
-                        _df[
-                            _df[self.date_field_name]
-                            > self._update_instruments[_code][
-                                self.INSTRUMENTS_END_FIELD
-                            ]
-                        ][self.date_field_name]
-                        .sort_values()
-                        .to_list()
-                    )
-                    if _update_calendars:
-                        self._update_instruments[_code][self.INSTRUMENTS_END_FIELD] = (
-                            self._format_datetime(_end)
-                        )
-                        futures[
-                            executor.submit(self._dump_bin, _df, _update_calendars)
-                        ] = _code
-                else:
-                    _dt_range = self._update_instruments.setdefault(_code, dict())
-                    _dt_range[self.INSTRUMENTS_START_FIELD] = self._format_datetime(
-                        _start
-                    )
-                    _dt_range[self.INSTRUMENTS_END_FIELD] = self._format_datetime(_end)
-                    futures[
-                        executor.submit(self._dump_bin, _df, self._new_calendar_list)
-                    ] = _code
+                _dt_range = {self.INSTRUMENTS_END_FIELD: self._format_datetime(_end)}
+                _calendar = _update_calendars
+            else:
+                _dt_range = {
+                    self.INSTRUMENTS_START_FIELD: self._format_datetime(_start),
+                    self.INSTRUMENTS_END_FIELD: self._format_datetime(_end),
+                }
+                # the new calendar is shared by the workers, see _init_worker
+                _calendar = None
+            if manifest.is_done(_code, fingerprint):
+                self._track_cross_section(_code)
+                self._update_instruments.setdefault(_code, dict()).update(_dt_range)
+                skipped += 1
+                continue
+            self._begin_symbol(manifest, _code)
+            tasks.append(((_code, fingerprint, _dt_range), (_df, _calendar)))
 
-            with tqdm(total=len(futures)) as p_bar:
-                for _future in as_completed(futures):
-                    try:
-                        _future.result()
-                    except Exception:
-                        error_code[futures[_future]] = traceback.format_exc()
+        if skipped:
+            logger.info(f"skip {skipped} symbols completed by the previous run")
+        with tqdm(total=len(tasks)) as p_bar:
+            with self._executor(
+                len(tasks),
+                initializer=_init_worker,
+                initargs=(self, self._new_calendar_index),
+            ) as executor:
+                results = executor.starmap(
+                    _dump_bin_task,
+                    (task_args for _, task_args in tasks),
+                    return_exceptions=True,
+                )
+                for ((_code, fingerprint, _dt_range), _), _stats in zip(tasks, results):
+                    if isinstance(_stats, TaskError):
+                        error_code[_code] = _stats.traceback
+                        self._metrics.record_error(_code, _stats.traceback)
+                    else:
+                        manifest.commit(
+                            _code, fingerprint, getattr(_stats, "fields", ())
+                        )
+                        # only move the instrument range once its bins are written
+                        self._track_cross_section(_code)
+                        self._update_instruments.setdefault(_code, dict()).update(
+                            _dt_range
+                        )
+                        write_stats += _stats
+                        self._metrics.record_symbol(_code, _stats)
                     p_bar.update()
-            logger.info(f"dump bin errors: {error_code}")
+        logger.info(write_stats.summary(time.perf_counter() - start))
+        if error_code:
+            logger.error(f"{len(error_code)} symbols failed: {sorted(error_code)}")
 
+        if error_code:
+            manifest.close()
+        else:
+            manifest.finish()
         logger.info("end of features dump.\n")
 
     def dump(self):
         self.save_calendars(self._new_calendar_list)
-        self._dump_features()
+        with self._metrics.stage("features"):
+            self._dump_features()
         df = pd.DataFrame.from_dict(self._update_instruments, orient="index")
         df.index.names = [self.symbol_field_name]
         self.save_instruments(df.reset_index())
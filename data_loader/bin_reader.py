@@ -0,0 +1,178 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from qlib.utils import code_to_fname
+
+from calendar_index import CalendarIndex
+
+
+class BinReader:
+    """
+    Read a qlib dir back without the expression engine.
+
+    Every ``features/<code>/<field>.<freq>.bin`` is memory-mapped and sliced
+    with the calendar of ``calendars/<freq>.txt``, so a full-market panel is
+    one memcpy per instrument instead of a per-instrument ``D.features`` call.
+    Used to validate dumps and for bulk loads of raw fields.
+
+    Parameters
+    ----------
+    qlib_dir : Union[str, Path]
+        The qlib dir written by the dumpers.
+    freq : str
+        Frequency of the calendar and of the bin files.
+    """
+
+    def __init__(self, qlib_dir: Union[str, Path], freq: str = "day"):
+        self.qlib_dir = Path(qlib_dir).expanduser()
+        self.freq = freq
+        self._calendar = None
+
+    @property
+    def calendar(self) -> CalendarIndex:
+        if self._calendar is None:
+            calendar_path = self.qlib_dir.joinpath("calendars", f"{self.freq}.txt")
+            self._calendar = CalendarIndex(
+                pd.read_csv(calendar_path, header=None).loc[:, 0].tolist()
+            )
+        return self._calendar
+
+    def instruments(self, market: str = "all") -> List[str]:
+        """Symbols listed in ``instruments/<market>.txt``."""
+        df = pd.read_csv(
+            self.qlib_dir.joinpath("instruments", f"{market}.txt"),
+            sep="\t",
+            header=None,
+            usecols=[0],
+        )
+        return df[0].astype(str).str.upper().tolist()
+
+    def bin_path(self, code: str, field: str) -> Path:
+        return self.qlib_dir.joinpath(
+            "features",
+            code_to_fname(code).lower(),
+            f"{field.lower()}.{self.freq}.bin",
+        )
+
+    def read(self, code: str, field: str) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Calendar position of the first value and the memory-mapped values of
+        one bin, None if the instrument has no such field.
+        """
+        bin_path = self.bin_path(code, field)
+        if not bin_path.exists() or bin_path.stat().st_size < 4:
+            return None
+        data = np.memmap(bin_path, dtype="<f", mode="r")
+        return int(data[0]), data[1:]
+
+    def _resolve(
+        self,
+        instruments: Union[str, Iterable[str], None],
+        start_time=None,
+        end_time=None,
+    ) -> Tuple[List[str], int, int]:
+        if instruments is None:
+            instruments = "all"
+        if isinstance(instruments, str):
+            instruments = self.instruments(instruments)
+        codes = [str(code).upper() for code in instruments]
+        calendar = self.calendar
+        i, j = calendar.slice_range(
+            calendar.values[0] if start_time is None else start_time,
+            calendar.values[-1] if end_time is None else end_time,
+        )
+        return codes, i, j
+
+    def _fill(self, out: np.ndarray, codes: List[str], field: str, i: int, j: int):
+        # out is (N, T): each instrument is one contiguous copy
+        for row, code in zip(out, codes):
+            series = self.read(code, field)
+            if series is None:
+                continue
+            start, values = series
+            lo, hi = max(i, start), min(j, start + len(values))
+            if lo < hi:
+                row[lo - i : hi - i] = values[lo - start : hi - start]
+
+    def panel(
+        self,
+        fields: Union[str, Iterable[str]],
+        instruments: Union[str, Iterable[str], None] = None,
+        start_time=None,
+        end_time=None,
+    ) -> Tuple[pd.DatetimeIndex, List[str], Dict[str, np.ndarray]]:
+        """
+        Dense ``T x N`` float32 panels, ``NaN`` outside of each instrument's
+        history.
+
+        Parameters
+        ----------
+        fields : Union[str, Iterable[str]]
+            Field names, with or without the ``$`` of qlib expressions.
+        instruments : Union[str, Iterable[str]]
+            A market name of ``instruments/`` or a list of symbols, default all.
+        start_time, end_time :
+            Inclusive date range, default the whole calendar.
+
+        Returns
+        -------
+        dates : pd.DatetimeIndex
+            The ``T`` calendar dates.
+        codes : List[str]
+            The ``N`` symbols.
+        panels : Dict[str, np.ndarray]
+            One ``(T, N)`` array per field. Arrays are transposed views of
+            ``(N, T)`` C-ordered buffers, which pandas wraps without copying.
+        """
+        if isinstance(fields, str):
+            fields = [fields]
+        codes, i, j = self._resolve(instruments, start_time, end_time)
+        panels = {}
+        for field in fields:
+            field = field.lstrip("$")
+            out = np.full((len(codes), j - i), np.nan, dtype="<f")
+            self._fill(out, codes, field, i, j)
+            panels[field] = out.T
+        return self.calendar[i:j], codes, panels
+
+    def frame(
+        self,
+        field: str,
+        instruments: Union[str, Iterable[str], None] = None,
+        start_time=None,
+        end_time=None,
+    ) -> pd.DataFrame:
+        """``panel`` of one field as a dates x symbols DataFrame, without copying it."""
+        dates, codes, panels = self.panel(field, instruments, start_time, end_time)
+        return pd.DataFrame(
+            panels[field.lstrip("$")],
+            index=dates.rename("datetime"),
+            columns=pd.Index(codes, name="instrument"),
+            copy=False,
+        )
+
+
+def load_panel(
+    qlib_dir: Union[str, Path],
+    fields: Union[str, Iterable[str]],
+    instruments: Union[str, Iterable[str], None] = None,
+    start_time=None,
+    end_time=None,
+    freq: str = "day",
+) -> Dict[str, pd.DataFrame]:
+    """
+    Load raw fields of a qlib dir as one dates x symbols DataFrame per field.
+
+    See ``BinReader.panel`` for the parameters.
+    """
+    dates, codes, panels = BinReader(qlib_dir, freq).panel(
+        fields, instruments, start_time, end_time
+    )
+    index = dates.rename("datetime")
+    columns = pd.Index(codes, name="instrument")
+    return {
+        field: pd.DataFrame(panel, index=index, columns=columns, copy=False)
+        for field, panel in panels.items()
+    }
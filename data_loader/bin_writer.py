@@ -0,0 +1,164 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# one write per field file, large enough for a full daily history in one go
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+@dataclass
+class BinWriteStats:
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    fields: Tuple[str, ...] = ()
+    # filled in by the dumpers, see DumpDataBase._dump_bin
+    read_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    merge_seconds: float = 0.0
+
+    def __add__(self, other: "BinWriteStats") -> "BinWriteStats":
+        if other is None:
+            return self
+        return BinWriteStats(
+            self.files + other.files,
+            self.bytes + other.bytes,
+            self.seconds + other.seconds,
+            tuple(sorted(set(self.fields) | set(other.fields))),
+            self.read_seconds + other.read_seconds,
+            self.parse_seconds + other.parse_seconds,
+            self.merge_seconds + other.merge_seconds,
+        )
+
+    __radd__ = __add__
+
+    def summary(self, elapsed: float) -> str:
+        elapsed = max(elapsed, 1e-9)
+        return (
+            f"wrote {self.files} files, {self.bytes / 1024 / 1024:.1f} MB in "
+            f"{elapsed:.2f}s: {self.files / elapsed:.0f} files/s, "
+            f"{self.bytes / 1024 / 1024 / elapsed:.1f} MB/s "
+            f"({self.seconds:.2f}s spent in writes)"
+        )
+
+
+def write_bin_block(
+    bin_paths: Sequence[Path],
+    date_index: int,
+    values: np.ndarray,
+    append: List[bool] = None,
+    buffer_size: int = WRITE_BUFFER_SIZE,
+) -> BinWriteStats:
+    """
+    Write every field of an aligned symbol in one pass.
+
+    ``values`` (one row per calendar date, one column per field) is converted
+    once into a ``float32`` block whose row ``i`` is the whole content of
+    ``bin_paths[i]``: the start ``date_index`` followed by the field values.
+    Each file is then written from a contiguous row view with a single
+    buffered write, without per-field copies.
+
+    Parameters
+    ----------
+    bin_paths : Sequence[Path]
+        One file per column of ``values``.
+    date_index : int
+        Calendar position of the first row.
+    values : np.ndarray
+        ``(n_dates, n_fields)`` array.
+    append : List[bool]
+        Per file, append the values (without the start index) to the
+        existing file instead of rewriting it.
+    buffer_size : int
+        Buffer size of the opened files.
+    """
+    start = time.perf_counter()
+    values = np.asarray(values)
+    if values.ndim == 1:
+        values = values[:, None]
+    block = np.empty((values.shape[1], values.shape[0] + 1), dtype="<f")
+    block[:, 0] = date_index
+    block[:, 1:] = values.T
+    if append is None:
+        append = [False] * len(bin_paths)
+
+    stats = BinWriteStats()
+    for row, bin_path, _append in zip(block, bin_paths, append):
+        data = row[1:] if _append else row
+        with open(bin_path, "ab" if _append else "wb", buffering=buffer_size) as fp:
+            fp.write(memoryview(data))
+        stats.files += 1
+        stats.bytes += data.nbytes
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def patch_bin_block(
+    bin_paths: Sequence[Path],
+    positions: np.ndarray,
+    values: np.ndarray,
+) -> BinWriteStats:
+    """
+    Overwrite the rows at calendar ``positions`` of existing bins in place.
+
+    Each file is memory-mapped and only the patched values are written; the
+    file is extended with ``NaN`` only when the patch goes past its last date.
+    A patch starting before the first date of a file, or a missing file, makes
+    it rewritten with the new start index. Calendar dates between the patched
+    positions that are not in ``positions`` keep their current values.
+
+    Parameters
+    ----------
+    bin_paths : Sequence[Path]
+        One file per column of ``values``.
+    positions : np.ndarray
+        Sorted, unique calendar positions of the rows of ``values``.
+    values : np.ndarray
+        ``(len(positions), n_fields)`` array.
+    """
+    start = time.perf_counter()
+    positions = np.asarray(positions, dtype=np.int64)
+    values = np.asarray(values, dtype="<f")
+    if values.ndim == 1:
+        values = values[:, None]
+    stats = BinWriteStats()
+    if not len(positions):
+        return stats
+    first, last = int(positions[0]), int(positions[-1])
+    for bin_path, column in zip(bin_paths, values.T):
+        bin_path = Path(bin_path)
+        old = None
+        if bin_path.exists() and bin_path.stat().st_size >= 4:
+            old = np.memmap(bin_path, dtype="<f", mode="r+")
+        if old is None or first < int(old[0]):
+            # new file or patch before the first date: rewrite with a new start
+            old_start = first if old is None else int(old[0])
+            old_end = first if old is None else old_start + len(old) - 1
+            end = max(last + 1, old_end)
+            block = np.full(end - first + 1, np.nan, dtype="<f")
+            block[0] = first
+            if old is not None:
+                block[1 + old_start - first : 1 + old_end - first] = old[1:]
+                del old
+            block[1 + positions - first] = column
+            with open(bin_path, "wb", buffering=WRITE_BUFFER_SIZE) as fp:
+                fp.write(memoryview(block))
+            stats.bytes += block.nbytes
+        else:
+            old_start, old_end = int(old[0]), int(old[0]) + len(old) - 1
+            if last >= old_end:
+                del old
+                with open(bin_path, "ab") as fp:
+                    fp.write(memoryview(np.full(last + 1 - old_end, np.nan, "<f")))
+                stats.bytes += (last + 1 - old_end) * 4
+                old = np.memmap(bin_path, dtype="<f", mode="r+")
+            old[1 + positions - old_start] = column
+            old.flush()
+            del old
+            stats.bytes += column.nbytes
+        stats.files += 1
+    stats.seconds = time.perf_counter() - start
+    return stats
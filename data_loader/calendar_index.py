@@ -0,0 +1,89 @@
+from typing import Iterable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+class CalendarIndex:
+    """
+    A trading calendar stored once as a sorted ``datetime64[ns]`` array.
+
+    Every lookup is a ``searchsorted`` (O(log n)) instead of a linear
+    ``list.index`` over python Timestamps, and the array is cheap to share
+    with thread workers or to pickle to process workers.
+
+    Parameters
+    ----------
+    calendar : Iterable
+        Anything ``pd.DatetimeIndex`` accepts: a list of Timestamps, strings or
+        a ``datetime64`` array.
+    """
+
+    def __init__(self, calendar: Union[Iterable, np.ndarray, "CalendarIndex"]):
+        if isinstance(calendar, CalendarIndex):
+            values = calendar.values
+        else:
+            values = pd.DatetimeIndex(calendar).values.astype("datetime64[ns]")
+        if len(values) > 1 and (np.diff(values.view("i8")) <= 0).any():
+            values = np.unique(values)
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return pd.DatetimeIndex(self.values[item])
+        return pd.Timestamp(self.values[item])
+
+    def __iter__(self):
+        return iter(pd.DatetimeIndex(self.values))
+
+    def to_list(self):
+        return pd.DatetimeIndex(self.values).tolist()
+
+    def position(self, date) -> int:
+        """Position of ``date`` in the calendar, ``ValueError`` if it is not a calendar date."""
+        date = np.datetime64(pd.Timestamp(date), "ns")
+        pos = int(np.searchsorted(self.values, date))
+        if pos >= len(self.values) or self.values[pos] != date:
+            raise ValueError(f"{pd.Timestamp(date)} is not in the calendar")
+        return pos
+
+    def slice_range(self, start, end) -> Tuple[int, int]:
+        """Half-open ``[i, j)`` positions of the calendar dates within ``[start, end]``."""
+        i = int(np.searchsorted(self.values, np.datetime64(pd.Timestamp(start), "ns")))
+        j = int(
+            np.searchsorted(
+                self.values, np.datetime64(pd.Timestamp(end), "ns"), side="right"
+            )
+        )
+        return i, j
+
+    def align(self, dates: np.ndarray, values: np.ndarray):
+        """
+        Scatter ``values`` (one row per date) onto the calendar between the
+        first and the last of ``dates``.
+
+        Returns
+        -------
+        start : int
+            calendar position of the first aligned row.
+        aligned : np.ndarray
+            ``float32`` array with one row per calendar date in the range,
+            ``NaN`` where ``dates`` has no row. Dates outside the calendar are
+            dropped.
+        """
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        values = np.asarray(values)
+        shape = (0,) + values.shape[1:]
+        if len(dates) == 0:
+            return 0, np.empty(shape, dtype="<f")
+        start, end = self.slice_range(dates.min(), dates.max())
+        window = self.values[start:end]
+        pos = np.searchsorted(window, dates)
+        valid = pos < len(window)
+        valid[valid] = window[pos[valid]] == dates[valid]
+        aligned = np.full((end - start,) + values.shape[1:], np.nan, dtype="<f")
+        aligned[pos[valid]] = values[valid]
+        return start, aligned
@@ -0,0 +1,179 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from bin_reader import BinReader
+
+
+class CrossSectionStore:
+    """
+    Per-field ``T x N`` float32 matrices of a qlib dir, one row per calendar
+    date, for cross-sectional reads (ranking, IC, top-k).
+
+    Stored in ``<qlib_dir>/cross_section/<freq>/``:
+
+    - ``<field>.f32``: the row-major matrix, memory-mapped; a date is one
+      contiguous row and a rolling window a contiguous block of rows.
+    - ``symbols.txt``: the symbol of every column.
+    - ``meta.json``: number of rows, column capacity and fields.
+
+    Rows are allocated for ``capacity`` columns so symbols listed later are
+    added without rewriting the matrices; the capacity doubles when it runs
+    out. The store is a secondary output derived from the per-instrument bins,
+    ``sync`` refreshes it after a dump.
+
+    Parameters
+    ----------
+    qlib_dir : Union[str, Path]
+        The qlib dir.
+    freq : str
+        Frequency of the calendar and of the bins.
+    """
+
+    DIR_NAME = "cross_section"
+    MIN_CAPACITY = 64
+
+    def __init__(self, qlib_dir: Union[str, Path], freq: str = "day"):
+        self.qlib_dir = Path(qlib_dir).expanduser()
+        self.freq = freq
+        self.store_dir = self.qlib_dir.joinpath(self.DIR_NAME, freq)
+        self._meta_path = self.store_dir.joinpath("meta.json")
+        self._symbols_path = self.store_dir.joinpath("symbols.txt")
+        self.rows, self.capacity, self.fields, self.symbols = 0, 0, [], []
+        if self._meta_path.exists():
+            with self._meta_path.open("r", encoding="utf-8") as fp:
+                meta = json.load(fp)
+            self.rows, self.capacity = meta["rows"], meta["capacity"]
+            self.fields = meta["fields"]
+            self.symbols = self._symbols_path.read_text().split()
+
+    def _matrix_path(self, field: str) -> Path:
+        return self.store_dir.joinpath(f"{field}.f32")
+
+    def _open(self, field: str, mode: str = "r") -> np.memmap:
+        return np.memmap(
+            self._matrix_path(field),
+            dtype="<f",
+            mode=mode,
+            shape=(self.rows, self.capacity),
+        )
+
+    def _save_meta(self):
+        self._symbols_path.write_text("\n".join(self.symbols) + "\n")
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as fp:
+            json.dump(
+                {"rows": self.rows, "capacity": self.capacity, "fields": self.fields},
+                fp,
+            )
+        tmp_path.replace(self._meta_path)
+
+    def _reshape(self, field: str, rows: int, capacity: int):
+        """Grow a matrix to ``rows x capacity``, new cells are NaN."""
+        path = self._matrix_path(field)
+        if not path.exists() or self.rows == 0:
+            with path.open("wb") as fp:
+                fp.write(memoryview(np.full((rows, capacity), np.nan, dtype="<f")))
+        elif capacity != self.capacity:
+            old = self._open(field)
+            new = np.full((rows, capacity), np.nan, dtype="<f")
+            new[: self.rows, : self.capacity] = old
+            del old
+            with path.open("wb") as fp:
+                fp.write(memoryview(new))
+        elif rows > self.rows:
+            # row-major: new dates are appended at the end of the file
+            with path.open("ab") as fp:
+                fp.write(
+                    memoryview(np.full((rows - self.rows, capacity), np.nan, "<f"))
+                )
+
+    def sync(
+        self,
+        fields: Iterable[str],
+        targets: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Copy the bins of ``targets`` into the matrices.
+
+        Parameters
+        ----------
+        fields : Iterable[str]
+            Fields to store.
+        targets : Dict[str, int]
+            Symbols to refresh, mapped to the first calendar row to copy (e.g.
+            the previous calendar length after an update). None, or a store
+            with other fields, rebuilds it from all instruments.
+        """
+        reader = BinReader(self.qlib_dir, self.freq)
+        rows = len(reader.calendar)
+        fields = sorted({field.lower() for field in fields})
+        if targets is None or fields != self.fields or rows < self.rows:
+            self.rows, self.capacity, self.symbols = 0, 0, []
+            targets = {code: 0 for code in reader.instruments()}
+            for path in self.store_dir.glob("*.f32"):
+                path.unlink()
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        for code in targets:
+            if code not in columns:
+                columns[code] = len(self.symbols)
+                self.symbols.append(code)
+        capacity = self.capacity
+        if len(self.symbols) > capacity:
+            capacity = max(self.MIN_CAPACITY, 2 * capacity, len(self.symbols))
+        for field in fields:
+            self._reshape(field, rows, capacity)
+        self.rows, self.capacity, self.fields = rows, capacity, fields
+
+        # one panel read per distinct first row, usually two (new and updated symbols)
+        by_start = {}
+        for code, start in targets.items():
+            by_start.setdefault(int(start), []).append(code)
+        for start, codes in by_start.items():
+            if start >= rows:
+                continue
+            index = np.array([columns[code] for code in codes])
+            _, _, panels = reader.panel(
+                fields, codes, reader.calendar[start], reader.calendar[rows - 1]
+            )
+            for field in fields:
+                matrix = self._open(field, "r+")
+                matrix[start:, index] = panels[field]
+                matrix.flush()
+                del matrix
+        self._save_meta()
+        logger.info(
+            f"cross-section store: {len(targets)} symbols refreshed, "
+            f"{self.rows} dates x {len(self.symbols)} symbols"
+        )
+
+    def read(
+        self, field: str, start_time=None, end_time=None
+    ) -> Tuple[pd.DatetimeIndex, List[str], np.ndarray]:
+        """
+        The ``dates x symbols`` block of ``field`` between two dates, as a
+        read-only memory-mapped view (no copy).
+        """
+        calendar = BinReader(self.qlib_dir, self.freq).calendar
+        i, j = calendar.slice_range(
+            calendar.values[0] if start_time is None else start_time,
+            calendar.values[-1] if end_time is None else end_time,
+        )
+        j = min(j, self.rows)
+        matrix = self._open(field.lstrip("$").lower())
+        return calendar[i:j], self.symbols, matrix[i:j, : len(self.symbols)]
+
+    def frame(self, field: str, start_time=None, end_time=None) -> pd.DataFrame:
+        dates, symbols, values = self.read(field, start_time, end_time)
+        return pd.DataFrame(
+            values,
+            index=dates.rename("datetime"),
+            columns=pd.Index(symbols, name="instrument"),
+            copy=False,
+        )
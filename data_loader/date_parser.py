@@ -0,0 +1,168 @@
+import threading
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# process-wide cache of parsed YYYYMMDD integers -> datetime64[ns] as int64.
+# A market only has a few thousand trading days, so every chunk, file and
+# symbol of a dump hits the same small set of keys.
+_DATE_CACHE: Dict[int, int] = {}
+_DATE_CACHE_LOCK = threading.Lock()
+DATE_CACHE_MAX_SIZE = 1 << 20
+
+_NAT = np.datetime64("NaT", "ns").view("i8")
+
+
+def _yyyymmdd_to_ns(values: np.ndarray) -> np.ndarray:
+    """Vectorized integer YYYYMMDD -> datetime64[ns] as int64, NaT for invalid dates."""
+    values = values.astype(np.int64)
+    year, month, day = values // 10000, values // 100 % 100, values % 100
+    valid = (
+        (values >= 10000101)
+        & (values <= 99991231)
+        & (month >= 1)
+        & (month <= 12)
+        & (day >= 1)
+        & (day <= 31)
+    )
+    months = (year - 1970) * 12 + month - 1
+    first = np.where(valid, months, 0).astype("datetime64[M]").astype("datetime64[D]")
+    dates = first + np.where(valid, day - 1, 0).astype("timedelta64[D]")
+    # 20210231 rolls over into March: treat it as invalid like strptime does
+    valid &= dates.astype("datetime64[M]") == first.astype("datetime64[M]")
+    result = dates.astype("datetime64[ns]").view("i8")
+    result[~valid] = _NAT
+    return result
+
+
+def _parse_unique_ints(uniques: np.ndarray) -> np.ndarray:
+    with _DATE_CACHE_LOCK:
+        cached = [_DATE_CACHE.get(v) for v in uniques.tolist()]
+    missing = np.array([c is None for c in cached], dtype=bool)
+    result = np.array([_NAT if c is None else c for c in cached], dtype=np.int64)
+    if missing.any():
+        parsed = _yyyymmdd_to_ns(uniques[missing])
+        result[missing] = parsed
+        with _DATE_CACHE_LOCK:
+            if len(_DATE_CACHE) + len(parsed) > DATE_CACHE_MAX_SIZE:
+                _DATE_CACHE.clear()
+            _DATE_CACHE.update(zip(uniques[missing].tolist(), parsed.tolist()))
+    return result
+
+
+def _parse_uniques(uniques: np.ndarray) -> np.ndarray:
+    if np.issubdtype(uniques.dtype, np.integer):
+        return _parse_unique_ints(uniques)
+    if np.issubdtype(uniques.dtype, np.floating):
+        # integer dates read as float because of missing values
+        result = np.full(len(uniques), _NAT, dtype=np.int64)
+        integral = np.isfinite(uniques) & (uniques == np.floor(uniques))
+        result[integral] = _parse_unique_ints(uniques[integral].astype(np.int64))
+        return result
+    text = pd.Index(uniques).astype(str)
+    digits = np.asarray(text.str.fullmatch(r"\d{8}"), dtype=bool)
+    result = np.full(len(uniques), _NAT, dtype=np.int64)
+    if digits.any():
+        result[digits] = _parse_unique_ints(
+            np.asarray(text[digits], dtype=object).astype(np.int64)
+        )
+    if not digits.all():
+        result[~digits] = (
+            pd.to_datetime(text[~digits], format="%Y%m%d", errors="coerce")
+            .values.astype("datetime64[ns]")
+            .view("i8")
+        )
+    return result
+
+
+def parse_yyyymmdd(values) -> pd.Series:
+    """
+    Fast equivalent of ``pd.to_datetime(values.astype(str), format="%Y%m%d", errors="coerce")``.
+
+    Only the unique values are parsed, with integer arithmetic for integer,
+    integral float and 8-digit string dates, and mapped back to the rows.
+    Parsed days are kept in a process-wide cache shared by every call, so the
+    same trading days are not parsed again for each file or chunk.
+
+    Parameters
+    ----------
+    values : pd.Series or array-like
+        Dates as ``YYYYMMDD`` integers or strings. Datetime input is returned
+        unchanged.
+
+    Returns
+    -------
+    pd.Series
+        ``datetime64[ns]`` series with the index of ``values``, ``NaT`` where
+        a value is not a valid date.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = np.asarray(uniques)
+    parsed = np.append(_parse_uniques(uniques), _NAT)
+    # the sentinel -1 of missing values picks the trailing NaT
+    result = parsed[codes].view("datetime64[ns]")
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def _split_int_timestamps(values: np.ndarray):
+    """Day part (``YYYYMMDD``) and nanoseconds of the time of day of integer timestamps."""
+    values = values.astype(np.int64)
+    if values.size and values.max() >= 10**13:
+        # YYYYMMDDHHMMSS
+        days, hms = values // 1_000_000, values % 1_000_000
+        hour, minute, second = hms // 10000, hms // 100 % 100, hms % 100
+    elif values.size and values.max() >= 10**11:
+        # YYYYMMDDHHMM
+        days, hm = values // 10000, values % 10000
+        hour, minute, second = hm // 100, hm % 100, np.zeros_like(hm)
+    else:
+        zeros = np.zeros_like(values)
+        return values, zeros, np.ones(len(values), dtype=bool)
+    valid = (hour < 24) & (minute < 60) & (second < 60)
+    nanoseconds = ((hour * 60 + minute) * 60 + second) * 1_000_000_000
+    return days, nanoseconds, valid
+
+
+def parse_timestamps(values) -> pd.Series:
+    """
+    Parse intraday timestamps, the ``parse_yyyymmdd`` of high-frequency data.
+
+    Integers are read as ``YYYYMMDDHHMMSS``, ``YYYYMMDDHHMM`` or ``YYYYMMDD``
+    depending on their magnitude, with the day part parsed through the
+    cached ``YYYYMMDD`` path; anything else goes to ``pd.to_datetime``, which
+    infers the format from the first value.
+
+    Parameters
+    ----------
+    values : pd.Series or array-like
+        Timestamps as integers, strings or datetimes.
+
+    Returns
+    -------
+    pd.Series
+        ``datetime64[ns]`` series with the index of ``values``, ``NaT`` where
+        a value is not a valid timestamp.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("datetime64[ns]")
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_float_dtype(series):
+        raw = series.to_numpy(dtype=float, na_value=np.nan)
+        integral = np.isfinite(raw) & (raw == np.floor(raw))
+        result = np.full(len(raw), _NAT, dtype=np.int64)
+        days, nanoseconds, valid = _split_int_timestamps(raw[integral])
+        uniques, inverse = np.unique(days, return_inverse=True)
+        parsed = _parse_unique_ints(uniques)[inverse]
+        valid &= parsed != _NAT
+        parsed[valid] += nanoseconds[valid]
+        parsed[~valid] = _NAT
+        result[integral] = parsed
+        return pd.Series(
+            result.view("datetime64[ns]"), index=series.index, name=series.name
+        )
+    parsed = pd.to_datetime(series, errors="coerce")
+    return parsed.astype("datetime64[ns]")
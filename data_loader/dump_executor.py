@@ -0,0 +1,168 @@
+import traceback
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+SERIAL = "serial"
+THREAD = "thread"
+PROCESS = "process"
+AUTO = "auto"
+BACKENDS = (SERIAL, THREAD, PROCESS, AUTO)
+
+# below this many tasks a pool costs more than it saves
+MIN_PARALLEL_TASKS = 8
+
+
+class TaskError:
+    """Returned in place of a result by ``imap(..., return_exceptions=True)``."""
+
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+        self.traceback = "".join(
+            traceback.format_exception(
+                type(exception), exception, exception.__traceback__
+            )
+        )
+
+    def __repr__(self):
+        return f"TaskError({self.exception!r})"
+
+
+def _call(fn: Callable, item, star: bool, return_exceptions: bool):
+    try:
+        return fn(*item) if star else fn(item)
+    except Exception as e:
+        if not return_exceptions:
+            raise
+        return TaskError(e)
+
+
+def _run_chunk(fn: Callable, chunk: list, star: bool, return_exceptions: bool):
+    return [_call(fn, item, star, return_exceptions) for item in chunk]
+
+
+def choose_backend(
+    n_tasks: Optional[int], max_workers: int, cpu_bound: bool = True
+) -> str:
+    """
+    Default backend for a workload: serial for tiny jobs or a single worker,
+    processes for CPU-bound pandas work (parsing, alignment) that would be
+    GIL-bound in threads, threads for I/O-bound work.
+    """
+    if max_workers <= 1 or (n_tasks is not None and n_tasks < MIN_PARALLEL_TASKS):
+        return SERIAL
+    return PROCESS if cpu_bound else THREAD
+
+
+def default_chunk_size(n_tasks: Optional[int], max_workers: int, backend: str) -> int:
+    """Process tasks are batched so that each worker gets ~4 chunks, capped at 64 items."""
+    if backend != PROCESS or not n_tasks:
+        return 1
+    return max(1, min(64, n_tasks // (max_workers * 4)))
+
+
+class DumpExecutor:
+    """
+    The executor shared by all dumpers.
+
+    Tasks are mapped in order over a serial, thread or process backend. With
+    processes, items are sent in chunks of ``chunk_size`` so a 5k-symbol dump
+    does not pay one IPC round trip per symbol, and at most ``2 * max_workers``
+    chunks are in flight so lazily produced inputs (e.g. a sqlite stream) are
+    not materialized at once.
+
+    Parameters
+    ----------
+    backend : str
+        ``serial``, ``thread``, ``process`` or ``auto`` (see ``choose_backend``).
+    max_workers : int
+        Pool size.
+    chunk_size : int
+        Items per process task, None for ``default_chunk_size``.
+    n_tasks : int
+        Expected number of items, used by ``auto`` and the default chunk size.
+    cpu_bound : bool
+        Hint for ``auto``.
+    initializer, initargs :
+        Run once per worker process; for the serial and thread backends it
+        runs once in the current process, whose state the threads share.
+    """
+
+    def __init__(
+        self,
+        backend: str = AUTO,
+        max_workers: int = 16,
+        chunk_size: Optional[int] = None,
+        n_tasks: Optional[int] = None,
+        cpu_bound: bool = True,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"executor backend must be one of {BACKENDS}: {backend}")
+        max_workers = max(1, int(max_workers))
+        if backend == AUTO:
+            backend = choose_backend(n_tasks, max_workers, cpu_bound)
+        self.backend = backend
+        self.max_workers = max_workers
+        self.chunk_size = (
+            int(chunk_size)
+            if chunk_size
+            else default_chunk_size(n_tasks, max_workers, backend)
+        )
+        self._pool: Optional[Executor] = None
+        if backend == PROCESS:
+            self._pool = ProcessPoolExecutor(
+                max_workers=max_workers, initializer=initializer, initargs=initargs
+            )
+        else:
+            if initializer is not None:
+                initializer(*initargs)
+            if backend == THREAD:
+                self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def imap(
+        self,
+        fn: Callable,
+        iterable: Iterable,
+        star: bool = False,
+        return_exceptions: bool = False,
+    ) -> Iterator:
+        """
+        Lazily map ``fn`` over ``iterable``, yielding results in input order.
+
+        ``star`` unpacks each item as positional arguments. With
+        ``return_exceptions`` a failing item yields a ``TaskError`` instead of
+        aborting the whole map.
+        """
+        if self._pool is None:
+            for item in iterable:
+                yield _call(fn, item, star, return_exceptions)
+            return
+        iterator = iter(iterable)
+        pending = deque()
+        while True:
+            while len(pending) < self.max_workers * 2:
+                chunk = list(islice(iterator, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(
+                    self._pool.submit(_run_chunk, fn, chunk, star, return_exceptions)
+                )
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+    def starmap(self, fn: Callable, iterable: Iterable, **kwargs) -> Iterator:
+        return self.imap(fn, iterable, star=True, **kwargs)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+
+def source_fingerprint(file_or_data: Union[Path, pd.DataFrame]) -> str:
+    """Cheap identity of a dump source: size and mtime of a file, content hash of a DataFrame."""
+    if isinstance(file_or_data, pd.DataFrame):
+        digest = pd.util.hash_pandas_object(file_or_data, index=False).to_numpy()
+        return hashlib.sha1(digest.tobytes()).hexdigest()
+    stat = Path(file_or_data).stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def calendar_fingerprint(calendar: Iterable) -> str:
+    values = pd.DatetimeIndex(getattr(calendar, "values", calendar)).values
+    return hashlib.sha1(
+        values.astype("datetime64[ns]").view(np.int64).tobytes()
+    ).hexdigest()
+
+
+class DumpManifest:
+    """
+    Append-only JSON-lines log of a dump job, used to resume it after a crash.
+
+    The first line holds the job signature (dumper, frequency, calendar,
+    fields). Every finished symbol appends a ``commit`` line with its source
+    fingerprint and the fields written. Appending dumps also log a ``begin``
+    line with the size of the symbol's bin files before they are touched, so a
+    symbol interrupted mid-append is truncated back and redone instead of
+    being appended twice.
+
+    A manifest whose signature differs from the current job is discarded, and
+    the file is removed once the job completes.
+    """
+
+    def __init__(self, path: Union[str, Path], signature: dict, resume: bool = True):
+        self.path = Path(path)
+        self.signature = json.loads(json.dumps(signature, default=str))
+        self._done: Dict[str, dict] = {}
+        pending = {}
+        if resume and self.path.exists():
+            pending = self._load()
+        if self._done or pending:
+            self._rollback(pending)
+            logger.info(
+                f"resume from {self.path.name}: {len(self._done)} symbols done, "
+                f"{len(pending)} partial symbols rolled back"
+            )
+            self._fp = self.path.open("a", encoding="utf-8")
+        else:
+            self._fp = self.path.open("w", encoding="utf-8")
+            self._write({"signature": self.signature})
+
+    def _load(self) -> Dict[str, dict]:
+        pending = {}
+        with self.path.open("r", encoding="utf-8") as fp:
+            lines = fp.read().splitlines()
+        if not lines or json.loads(lines[0]).get("signature") != self.signature:
+            logger.info(f"{self.path.name} belongs to another job, start from scratch")
+            return pending
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # torn last line of a crashed run
+                continue
+            if "begin" in record:
+                pending[record["begin"]] = record
+                self._done.pop(record["begin"], None)
+            elif "commit" in record:
+                pending.pop(record["commit"], None)
+                self._done[record["commit"]] = record
+        return pending
+
+    @staticmethod
+    def _rollback(pending: Dict[str, dict]):
+        for record in pending.values():
+            sizes = record["sizes"]
+            for bin_path in Path(record["dir"]).glob(record["pattern"]):
+                if str(bin_path) not in sizes:
+                    # created by the interrupted run
+                    bin_path.unlink()
+                elif bin_path.stat().st_size > sizes[str(bin_path)]:
+                    os.truncate(bin_path, sizes[str(bin_path)])
+
+    def _write(self, record: dict):
+        self._fp.write(json.dumps(record) + "\n")
+        self._fp.flush()
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, symbol: str, fingerprint: str) -> bool:
+        record = self._done.get(symbol)
+        return record is not None and record["fingerprint"] == fingerprint
+
+    def fingerprints(self) -> Dict[str, str]:
+        """Source fingerprint of every committed symbol."""
+        return {symbol: record["fingerprint"] for symbol, record in self._done.items()}
+
+    def begin(self, symbol: str, bin_dir: Path, pattern: str):
+        """Record the bin files of ``symbol`` matching ``pattern`` before they are appended to."""
+        sizes = {str(p): p.stat().st_size for p in Path(bin_dir).glob(pattern)}
+        self._write(
+            {"begin": symbol, "dir": str(bin_dir), "pattern": pattern, "sizes": sizes}
+        )
+
+    def commit(self, symbol: str, fingerprint: str, fields: Iterable[str] = ()):
+        record = {"commit": symbol, "fingerprint": fingerprint, "fields": list(fields)}
+        self._done[symbol] = record
+        self._write(record)
+
+    def close(self):
+        if not self._fp.closed:
+            self._fp.close()
+
+    def finish(self):
+        """The job completed: drop the manifest."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,248 @@
+import heapq
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+# seconds, prometheus-style cumulative buckets
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    float("inf"),
+)
+SLOWEST_SYMBOLS = 10
+METRIC_PREFIX = "qlib_dump"
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = np.asarray(buckets, dtype=float)
+        self.counts = np.zeros(len(self.buckets), dtype=np.int64)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[np.searchsorted(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self) -> Dict[str, int]:
+        return {
+            ("+Inf" if np.isinf(le) else f"{le:g}"): int(count)
+            for le, count in zip(self.buckets, np.cumsum(self.counts))
+        }
+
+    def to_dict(self) -> dict:
+        return {"buckets": self.cumulative(), "sum": self.sum, "count": self.count}
+
+
+def _peak_rss_bytes() -> Dict[str, Optional[int]]:
+    if resource is None:
+        return {"main": None, "workers": None}
+    # kilobytes on linux, bytes on macos
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "main": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "workers": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+class DumpMetrics:
+    """
+    Stage timers, per-symbol latency histograms and counters of a dump job.
+
+    The dumpers time their stages (``stage``) in the main process and feed the
+    ``BinWriteStats`` returned for every symbol by the workers
+    (``record_symbol``), which carry the read, date parsing, calendar merge and
+    write time of the symbol. ``save`` writes everything as JSON, or in the
+    Prometheus text format when the path ends with ``.prom``, for a nightly
+    job to track and alert on.
+
+    Parameters
+    ----------
+    dumper : str
+        Name of the dumper, used as a label.
+    """
+
+    SYMBOL_LATENCIES = ("read", "parse", "merge", "write")
+
+    def __init__(self, dumper: str):
+        self.dumper = dumper
+        self.started_at = time.time()
+        self.stages: Dict[str, float] = {}
+        self.histograms = {name: LatencyHistogram() for name in self.SYMBOL_LATENCIES}
+        self.bytes_written = 0
+        self.files_written = 0
+        self.symbols = 0
+        self.errors: Dict[str, str] = {}
+        self.success = None
+        self._slowest = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def record_symbol(self, symbol: str, stats):
+        """Account the ``BinWriteStats`` of one symbol; None (nothing written) is skipped."""
+        if stats is None:
+            return
+        self.symbols += 1
+        self.bytes_written += stats.bytes
+        self.files_written += stats.files
+        latencies = {
+            "read": stats.read_seconds,
+            "parse": stats.parse_seconds,
+            "merge": stats.merge_seconds,
+            "write": stats.seconds,
+        }
+        for name, seconds in latencies.items():
+            self.histograms[name].observe(seconds)
+        total = sum(latencies.values())
+        item = (total, str(symbol), latencies)
+        if len(self._slowest) < SLOWEST_SYMBOLS:
+            heapq.heappush(self._slowest, item)
+        else:
+            heapq.heappushpop(self._slowest, item)
+
+    def record_error(self, symbol: str, error: str):
+        self.errors[str(symbol)] = error
+        logger.error(f"{symbol} failed: {error.strip().splitlines()[-1]}")
+
+    def to_dict(self) -> dict:
+        return {
+            "dumper": self.dumper,
+            "started_at": self.started_at,
+            "duration_seconds": time.time() - self.started_at,
+            "success": self.success,
+            "stages_seconds": self.stages,
+            "symbol_latency_seconds": {
+                name: histogram.to_dict() for name, histogram in self.histograms.items()
+            },
+            "slowest_symbols": [
+                {"symbol": symbol, "seconds": total, **latencies}
+                for total, symbol, latencies in sorted(self._slowest, reverse=True)
+            ],
+            "symbols": self.symbols,
+            "files_written": self.files_written,
+            "bytes_written": self.bytes_written,
+            "errors": {"count": len(self.errors), "symbols": self.errors},
+            "peak_rss_bytes": _peak_rss_bytes(),
+        }
+
+    def to_prometheus(self) -> str:
+        label = f'dumper="{self.dumper}"'
+        lines = []
+
+        def _metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                labels = ",".join([label, *labels])
+                lines.append(f"{METRIC_PREFIX}_{name}{suffix}{{{labels}}} {value}")
+
+        data = self.to_dict()
+        _metric(
+            "success",
+            "gauge",
+            "1 if the last dump completed.",
+            [("", [], int(bool(self.success)))],
+        )
+        _metric(
+            "duration_seconds",
+            "gauge",
+            "Wall time of the dump.",
+            [("", [], data["duration_seconds"])],
+        )
+        _metric(
+            "stage_seconds",
+            "gauge",
+            "Wall time per dump stage.",
+            [
+                ("", [f'stage="{stage}"'], seconds)
+                for stage, seconds in self.stages.items()
+            ],
+        )
+        for name, histogram in self.histograms.items():
+            _metric(
+                f"symbol_{name}_seconds",
+                "histogram",
+                f"Per-symbol {name} latency.",
+                [
+                    ("_bucket", [f'le="{le}"'], count)
+                    for le, count in histogram.cumulative().items()
+                ]
+                + [("_sum", [], histogram.sum), ("_count", [], histogram.count)],
+            )
+        _metric(
+            "symbols_total", "counter", "Symbols written.", [("", [], self.symbols)]
+        )
+        _metric(
+            "files_written_total",
+            "counter",
+            "Bin files written.",
+            [("", [], self.files_written)],
+        )
+        _metric(
+            "bytes_written_total",
+            "counter",
+            "Bytes written to bins.",
+            [("", [], self.bytes_written)],
+        )
+        _metric(
+            "errors_total",
+            "counter",
+            "Symbols that failed.",
+            [("", [], len(self.errors))],
+        )
+        _metric(
+            "peak_rss_bytes",
+            "gauge",
+            "Peak resident memory.",
+            [
+                ("", [f'process="{process}"'], value)
+                for process, value in data["peak_rss_bytes"].items()
+                if value is not None
+            ],
+        )
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: Union[str, Path]):
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.to_dict(), indent=2)
+        # the file is scraped by other jobs: never expose a partial write
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(text)
+        tmp_path.replace(path)
+        logger.info(f"dump metrics saved to {path}")
@@ -2,6 +2,8 @@ import fire
 
 from all_dumper import DumpDataAll
 from fix_dumper import DumpDataFix
+from hf_dumper import DumpDataHighFreq
+from patch_dumper import DumpDataPatch
 from update_dumper import DumpDataUpdate
 
 if __name__ == "__main__":
@@ -10,5 +12,7 @@ if __name__ == "__main__":
             "dump_all": DumpDataAll,
             "dump_fix": DumpDataFix,
             "dump_update": DumpDataUpdate,
+            "dump_patch": DumpDataPatch,
+            "dump_highfreq": DumpDataHighFreq,
         }
     )
@@ -0,0 +1,99 @@
+import hashlib
+import importlib.util
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+from loguru import logger
+
+
+class SourceCache:
+    """
+    On-disk cache of parsed source files, in Arrow IPC format.
+
+    An entry is keyed by the resolved path, size and mtime of the source and by
+    the read options (projected columns, date field), so an edited source or a
+    different projection misses the cache. Hits are memory-mapped instead of
+    parsing the csv again. The cache keeps at most ``max_bytes`` of entries,
+    the least recently used ones are evicted by ``evict`` (hits refresh the
+    entry's mtime), which the dumpers call once at the end of a job.
+
+    Requires pyarrow; without it the cache is disabled and every read misses.
+
+    Parameters
+    ----------
+    cache_dir : Union[str, Path]
+        Directory of the entries.
+    max_bytes : int
+        Size cap of the directory.
+    """
+
+    SUFFIX = ".arrow"
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = 4 << 30):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_bytes = int(max_bytes)
+        self.enabled = importlib.util.find_spec("pyarrow") is not None
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            logger.warning("pyarrow is not installed, the source cache is disabled")
+
+    def _entry_path(self, file_path: Path, options: dict) -> Path:
+        file_path = Path(file_path).resolve()
+        stat = file_path.stat()
+        key = json.dumps(
+            [str(file_path), stat.st_size, stat.st_mtime_ns, options],
+            sort_keys=True,
+            default=str,
+        )
+        return self.cache_dir.joinpath(
+            hashlib.sha1(key.encode()).hexdigest() + self.SUFFIX
+        )
+
+    def get(self, file_path: Path, **options) -> Optional[pd.DataFrame]:
+        if not self.enabled:
+            return None
+        import pyarrow as pa
+
+        entry = self._entry_path(file_path, options)
+        try:
+            with pa.memory_map(str(entry), "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(entry)
+        except (OSError, pa.ArrowInvalid):
+            return None
+        return table.to_pandas()
+
+    def put(self, file_path: Path, df: pd.DataFrame, **options):
+        if not self.enabled:
+            return
+        import pyarrow as pa
+
+        entry = self._entry_path(file_path, options)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # concurrent workers may write the same entry: write aside, then rename
+        tmp_path = entry.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, entry)
+
+    def evict(self):
+        """Drop the least recently used entries until the cache fits in ``max_bytes``."""
+        entries = []
+        for path in self.cache_dir.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1].joinpath("data_loader")))
+
+from bin_writer import patch_bin_block, write_bin_block  # noqa: E402
+
+FIELDS = ("close", "volume")
+# calendar positions 5..12 are in the bins before the patch
+BASE_START, BASE_END = 5, 12
+
+
+def _values(positions, scale):
+    positions = np.asarray(positions, dtype="<f")
+    return np.column_stack([positions * scale, positions * scale * 100])
+
+
+def _write(directory, start, values):
+    bin_paths = [directory.joinpath(f"{field}.day.bin") for field in FIELDS]
+    write_bin_block(bin_paths, start, values)
+    return bin_paths
+
+
+@pytest.mark.parametrize(
+    "positions",
+    [
+        np.arange(7, 10),  # inside the bins
+        np.arange(10, 16),  # past the last date
+        np.array([14, 15]),  # past the last date, leaving a gap
+        np.arange(2, 7),  # before the first date
+    ],
+)
+def test_patch_bin_block_matches_a_full_rewrite(tmp_path, positions):
+    patched_dir, full_dir = tmp_path.joinpath("patched"), tmp_path.joinpath("full")
+    patched_dir.mkdir()
+    full_dir.mkdir()
+    base_positions = np.arange(BASE_START, BASE_END + 1)
+    bin_paths = _write(patched_dir, BASE_START, _values(base_positions, 1.0))
+
+    stats = patch_bin_block(bin_paths, positions, _values(positions, 2.0))
+    assert stats.files == len(FIELDS)
+
+    # the whole history rewritten: patched rows win, dates in neither are NaN
+    start = min(BASE_START, positions[0])
+    end = max(BASE_END, positions[-1])
+    expected = np.full((end - start + 1, len(FIELDS)), np.nan, dtype="<f")
+    expected[base_positions - start] = _values(base_positions, 1.0)
+    expected[positions - start] = _values(positions, 2.0)
+    for bin_path, full_path in zip(bin_paths, _write(full_dir, start, expected)):
+        np.testing.assert_array_equal(
+            np.fromfile(bin_path, dtype="<f4"), np.fromfile(full_path, dtype="<f4")
+        )
+
+
+def test_patch_bin_block_creates_missing_bins(tmp_path):
+    patched_dir, full_dir = tmp_path.joinpath("patched"), tmp_path.joinpath("full")
+    patched_dir.mkdir()
+    full_dir.mkdir()
+    bin_paths = [patched_dir.joinpath(f"{field}.day.bin") for field in FIELDS]
+    positions = np.array([3, 4, 6])
+    patch_bin_block(bin_paths, positions, _values(positions, 1.0))
+
+    expected = np.full((4, len(FIELDS)), np.nan, dtype="<f")
+    expected[positions - 3] = _values(positions, 1.0)
+    for bin_path, full_path in zip(bin_paths, _write(full_dir, 3, expected)):
+        np.testing.assert_array_equal(
+            np.fromfile(bin_path, dtype="<f4"), np.fromfile(full_path, dtype="<f4")
+        )
@@ -0,0 +1,87 @@
+import importlib
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1].joinpath("data_loader")))
+
+
+def _import_dumper(name):
+    # the dumpers import each other by lowercase names, which only resolve to
+    # the CamelCase files on case-insensitive file systems
+    sys.modules.setdefault("base_dumper", importlib.import_module("Base_Dumper"))
+    return importlib.import_module(name)
+
+
+All_Dumper = _import_dumper("All_Dumper")
+
+SYMBOLS = ["000001.SZ", "000002.SZ", "600000.SH"]
+
+
+def _write_sources(source_dir):
+    source_dir.mkdir()
+    dates = pd.bdate_range("20250818", periods=5).strftime("%Y%m%d").astype(int)
+    for symbol in SYMBOLS:
+        pd.DataFrame({"symbol": symbol, "date": dates, "close": 10.0}).to_csv(
+            source_dir.joinpath(f"{symbol}.csv"), index=False
+        )
+
+
+@pytest.mark.parametrize("single_pass", [False, True])
+def test_dump_all_records_failed_symbols_and_resumes(
+    tmp_path, monkeypatch, single_pass
+):
+    source_dir, qlib_dir = tmp_path.joinpath("src"), tmp_path.joinpath("qlib")
+    metrics_path = tmp_path.joinpath("metrics.json")
+    _write_sources(source_dir)
+
+    dump_bin = All_Dumper.DumpDataAll._dump_bin
+
+    def _failing_dump_bin(self, file_or_data, calendar_list):
+        if self._source_key(file_or_data)[0].upper() == "000002.SZ":
+            raise ValueError("corrupt source")
+        return dump_bin(self, file_or_data, calendar_list)
+
+    # one failing symbol does not stop the others and is counted in the report
+    with monkeypatch.context() as patch:
+        patch.setattr(All_Dumper.DumpDataAll, "_dump_bin", _failing_dump_bin)
+        All_Dumper.DumpDataAll(
+            source_dir,
+            qlib_dir,
+            include_fields="close",
+            max_workers=1,
+            metrics_path=metrics_path,
+            single_pass=single_pass,
+        )()
+    errors = json.loads(metrics_path.read_text())["errors"]
+    assert errors["count"] == 1
+    assert [symbol.upper() for symbol in errors["symbols"]] == ["000002.SZ"]
+    features = qlib_dir.joinpath("features")
+    assert sorted(p.name for p in features.iterdir()) == ["000001.sz", "600000.sh"]
+
+    # the manifest is kept: the next run only dumps the failed symbol
+    All_Dumper.DumpDataAll(
+        source_dir,
+        qlib_dir,
+        include_fields="close",
+        max_workers=1,
+        metrics_path=metrics_path,
+        single_pass=single_pass,
+    )()
+    report = json.loads(metrics_path.read_text())
+    assert report["errors"]["count"] == 0
+    assert report["symbols"] == 1
+    assert list(report["stages_seconds"])[:4] == [
+        "dates",
+        "calendars",
+        "instruments",
+        "features",
+    ]
+    assert sorted(p.name for p in features.iterdir()) == [
+        "000001.sz",
+        "000002.sz",
+        "600000.sh",
+    ]
@@ -0,0 +1,62 @@
+import importlib
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1].joinpath("data_loader")))
+
+
+def _import_dumper(name):
+    # the dumpers import each other by lowercase names, which only resolve to
+    # the CamelCase files on case-insensitive file systems
+    for alias in ("Base_Dumper", "All_Dumper"):
+        sys.modules.setdefault(alias.lower(), importlib.import_module(alias))
+    return importlib.import_module(name)
+
+
+All_Dumper = _import_dumper("All_Dumper")
+Fix_Dumper = _import_dumper("Fix_Dumper")
+
+
+def _write_source(source_dir, symbol):
+    dates = pd.bdate_range("20250818", periods=5).strftime("%Y%m%d").astype(int)
+    pd.DataFrame({"symbol": symbol, "date": dates, "close": 10.0}).to_csv(
+        source_dir.joinpath(f"{symbol}.csv"), index=False
+    )
+
+
+def test_plain_fix_keeps_the_fingerprints_of_untouched_symbols(tmp_path):
+    source_dir, qlib_dir = tmp_path.joinpath("src"), tmp_path.joinpath("qlib")
+    metrics_path = tmp_path.joinpath("metrics.json")
+    source_dir.mkdir()
+    for symbol in ("000001.SZ", "000002.SZ", "600000.SH"):
+        _write_source(source_dir, symbol)
+    All_Dumper.DumpDataAll(source_dir, qlib_dir, include_fields="close")()
+
+    # a new listing, dumped by a plain fix
+    _write_source(source_dir, "600001.SH")
+    Fix_Dumper.DumpDataFix(
+        source_dir, qlib_dir, include_fields="close", metrics_path=metrics_path
+    )()
+    assert json.loads(metrics_path.read_text())["symbols"] == 1
+    fingerprints = json.loads(
+        qlib_dir.joinpath(".source_fingerprints.day.json").read_text()
+    )
+    assert sorted(code.upper() for code in fingerprints) == [
+        "000001.SZ",
+        "000002.SZ",
+        "600000.SH",
+        "600001.SH",
+    ]
+
+    # nothing changed since: a dump_changed fix has nothing to rewrite
+    Fix_Dumper.DumpDataFix(
+        source_dir,
+        qlib_dir,
+        include_fields="close",
+        metrics_path=metrics_path,
+        dump_changed=True,
+    )()
+    assert json.loads(metrics_path.read_text())["symbols"] == 0
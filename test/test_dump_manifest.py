@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1].joinpath("data_loader")))
+
+from dump_manifest import DumpManifest  # noqa: E402
+
+SIGNATURE = {"dumper": "DumpDataUpdate", "freq": "day", "fields": ["close"]}
+
+
+def test_reopened_manifest_rolls_back_an_uncommitted_begin(tmp_path):
+    manifest_path = tmp_path.joinpath("manifest.jsonl")
+    done_dir, partial_dir = tmp_path.joinpath("000001.sz"), tmp_path.joinpath(
+        "sh600000"
+    )
+    done_dir.mkdir()
+    partial_dir.mkdir()
+    close_bin = partial_dir.joinpath("close.day.bin")
+    close_bin.write_bytes(b"\0" * 16)
+
+    manifest = DumpManifest(manifest_path, SIGNATURE)
+    manifest.begin("000001.SZ", done_dir, "*.day.bin")
+    done_dir.joinpath("close.day.bin").write_bytes(b"\0" * 8)
+    manifest.commit("000001.SZ", "fp1", ["close"])
+    # crash while appending to SH600000: one bin grown, one created
+    manifest.begin("SH600000", partial_dir, "*.day.bin")
+    with close_bin.open("ab") as fp:
+        fp.write(b"\1" * 8)
+    partial_dir.joinpath("volume.day.bin").write_bytes(b"\1" * 8)
+    manifest.close()
+
+    manifest = DumpManifest(manifest_path, SIGNATURE)
+    assert close_bin.read_bytes() == b"\0" * 16
+    assert sorted(p.name for p in partial_dir.iterdir()) == ["close.day.bin"]
+    # the committed symbol is kept, the rolled back one is redone
+    assert done_dir.joinpath("close.day.bin").stat().st_size == 8
+    assert manifest.is_done("000001.SZ", "fp1")
+    assert not manifest.is_done("SH600000", "fp2")
+    assert manifest.fingerprints() == {"000001.SZ": "fp1"}
+
+    manifest.commit("SH600000", "fp2", ["close"])
+    manifest.finish()
+    assert not manifest_path.exists()
+
+
+def test_manifest_of_another_job_is_discarded(tmp_path):
+    manifest_path = tmp_path.joinpath("manifest.jsonl")
+    manifest = DumpManifest(manifest_path, SIGNATURE)
+    manifest.commit("000001.SZ", "fp1")
+    manifest.close()
+
+    manifest = DumpManifest(manifest_path, {**SIGNATURE, "freq": "1min"})
+    assert len(manifest) == 0
+    manifest.close()
+    # and so is any manifest without resume
+    manifest = DumpManifest(manifest_path, SIGNATURE, resume=False)
+    assert manifest.fingerprints() == {}
+    manifest.close()
@@ -0,0 +1,160 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(
+    0, str(Path(__file__).resolve().parents[1].joinpath("data_handler", "features"))
+)
+
+from market_store import (  # noqa: E402
+    board_of,
+    build_documents,
+    limit_prices,
+    price_limit_ratio,
+    store_documents,
+)
+
+
+def _daily(symbols, trade_date="20250822", pre_close=10.0):
+    return pd.DataFrame(
+        {
+            "ts_code": symbols,
+            "trade_date": trade_date,
+            "open": 10.0,
+            "high": 10.5,
+            "low": 9.8,
+            "close": 10.2,
+            "pre_close": pre_close,
+            "vol": 1000.0,
+            "amount": 10200.0,
+        }
+    )
+
+
+def test_board_of():
+    assert board_of(
+        ["600000.SH", "000001.SZ", "688981.SH", "300750.SZ", "301001.SZ", "830799.BJ"]
+    ).tolist() == ["main", "main", "star", "chinext", "chinext", "bse"]
+
+
+def test_price_limit_ratio():
+    symbols = [
+        "600000.SH",
+        "600000.SH",
+        "688981.SH",
+        "300750.SZ",
+        "300750.SZ",
+        "830799.BJ",
+    ]
+    dates = ["20250822", "20250822", "20250822", "20250822", "20200821", "20250822"]
+    is_st = [False, True, True, True, True, True]
+    np.testing.assert_allclose(
+        price_limit_ratio(symbols, dates, is_st), [0.1, 0.05, 0.2, 0.2, 0.05, 0.3]
+    )
+    # without dates ChiNext follows the current rules
+    np.testing.assert_allclose(price_limit_ratio(["300750.SZ"]), [0.2])
+
+
+def test_limit_prices_round_half_up():
+    up, down = limit_prices(
+        np.array([10.05, 1.15, 2.25, np.nan]), np.array([0.1, 0.1, 0.05, 0.1])
+    )
+    # 1.15 * 1.1 is 1.2649999... in floats, the exchange price is 1.27
+    np.testing.assert_array_equal(up, [11.06, 1.27, 2.36, np.nan])
+    np.testing.assert_array_equal(down, [9.05, 1.04, 2.14, np.nan])
+
+
+def test_build_documents():
+    df = _daily(["688981.SH", "600000.SH", "600001.SH", "830799.BJ"])
+    docs = build_documents(
+        df,
+        index_component={"600000.SH": "sz50"},
+        st_symbols={"600001.SH"},
+    )
+    by_symbol = {doc["symbol"]: doc for doc in docs}
+    assert [doc["symbol"] for doc in docs] == sorted(by_symbol)
+    assert (
+        by_symbol["600000.SH"]["limit_up"],
+        by_symbol["600000.SH"]["limit_down"],
+    ) == (11.0, 9.0)
+    assert (
+        by_symbol["600001.SH"]["limit_up"],
+        by_symbol["600001.SH"]["limit_down"],
+    ) == (10.5, 9.5)
+    assert (
+        by_symbol["688981.SH"]["limit_up"],
+        by_symbol["688981.SH"]["limit_down"],
+    ) == (12.0, 8.0)
+    assert (
+        by_symbol["830799.BJ"]["limit_up"],
+        by_symbol["830799.BJ"]["limit_down"],
+    ) == (13.0, 7.0)
+    assert by_symbol["600000.SH"]["index_component"] == "sz50"
+    assert by_symbol["600000.SH"]["volume"] == 1000.0
+    assert by_symbol["600000.SH"]["date"] == "20250822"
+    assert set(docs[0]) == {
+        "symbol",
+        "date",
+        "open",
+        "high",
+        "low",
+        "close",
+        "pre_close",
+        "volume",
+        "amount",
+        "limit_up",
+        "limit_down",
+        "index_component",
+    }
+
+    docs = build_documents(
+        df.assign(name=["中芯国际", "浦发银行", "*ST某某", "某某"]), 1
+    )
+    assert {doc["symbol"]: doc["limit_up"] for doc in docs}["600001.SH"] == 10.5
+    assert all(doc["index_component"] == 1 for doc in docs)
+    assert build_documents(df.iloc[:0]) == []
+
+
+class RecordingCollection:
+    """Stand-in collection recording the bulk writes it receives."""
+
+    def __init__(self, failing_symbols=()):
+        self.failing_symbols = set(failing_symbols)
+        self.calls = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls.append((operations, ordered))
+        failed = [
+            {"index": i, "code": 11000, "errmsg": "duplicate key"}
+            for i, op in enumerate(operations)
+            if op._filter["symbol"] in self.failing_symbols
+        ]
+        result = {
+            "nMatched": 0,
+            "nModified": 0,
+            "nUpserted": len(operations) - len(failed),
+            "writeErrors": failed,
+        }
+        if failed:
+            raise BulkWriteError(result)
+        return SimpleNamespace(bulk_api_result=result)
+
+
+def test_store_documents_upserts_in_chunks():
+    symbols = [f"{i:06d}.SZ" for i in range(25)]
+    docs = build_documents(_daily(symbols), None)
+    collection = RecordingCollection(failing_symbols={"000003.SZ"})
+
+    result = store_documents(collection, docs, chunk_size=10)
+
+    assert [len(ops) for ops, _ in collection.calls] == [10, 10, 5]
+    assert all(ordered is False for _, ordered in collection.calls)
+    op = collection.calls[0][0][1]
+    assert op._filter == {"symbol": "000001.SZ", "date": "20250822"}
+    assert op._doc == {"$set": docs[1]} and op._upsert
+    # the rest of the chunk of a failing document is still written
+    assert (result.upserted, result.errors) == (24, 1)
@@ -0,0 +1,301 @@
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(
+    0, str(Path(__file__).resolve().parents[1].joinpath("data_handler", "features"))
+)
+
+from market_store import build_documents  # noqa: E402
+from market_sync import (  # noqa: E402
+    FetchTask,
+    MarketSync,
+    TokenBucket,
+    call_with_retry,
+    fetch_last_dates,
+    fetch_last_dates_sqlite,
+    next_day,
+    plan_sync,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakePro:
+    """Local stand-in of the Tushare pro client."""
+
+    def __init__(self, failures=None, delay=0.0):
+        # symbol -> number of calls failing before a success, -1 always fails
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def stock_basic(self, exchange, list_status, fields):
+        return pd.DataFrame(
+            {
+                "ts_code": ["000001.SZ", "000002.SZ", "600000.SH", "688001.SH"],
+                "name": ["平安银行", "*ST万科", "ST浦发", "ST华兴"],
+            }
+        )
+
+    def trade_cal(self, exchange, start_date, end_date, is_open):
+        days = pd.bdate_range(start_date, end_date).strftime("%Y%m%d")
+        return pd.DataFrame({"exchange": "SSE", "cal_date": days, "is_open": 1})
+
+    def daily(
+        self, ts_code=None, trade_date=None, start_date=None, end_date=None, fields=None
+    ):
+        if trade_date is not None:
+            with self._lock:
+                self.calls.append(trade_date)
+            if self.failures.get(trade_date):
+                raise RuntimeError(f"quota exceeded for {trade_date}")
+            return pd.DataFrame(
+                {
+                    "ts_code": ["000001.SZ", "000002.SZ", "600000.SH"],
+                    "trade_date": trade_date,
+                    **{name: 1.0 for name in fields[2:]},
+                }
+            )
+        with self._lock:
+            self.calls.append(ts_code)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            remaining = self.failures.get(ts_code, 0)
+            if remaining:
+                self.failures[ts_code] = remaining - 1 if remaining > 0 else -1
+                raise RuntimeError(f"quota exceeded for {ts_code}")
+            if ts_code == "EMPTY.SZ":
+                return pd.DataFrame(columns=fields)
+            dates = pd.bdate_range(start_date, end_date).strftime("%Y%m%d")[::-1]
+            return pd.DataFrame(
+                {
+                    "ts_code": ts_code,
+                    "trade_date": dates,
+                    **{name: 1.0 for name in fields[2:]},
+                }
+            )
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _tasks(symbols):
+    return [FetchTask(symbol, "20250818", "20250822") for symbol in symbols]
+
+
+def test_token_bucket_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, sleep=clock.sleep)
+    for _ in range(6):
+        bucket.acquire()
+    # the first two are the burst, the next four wait half a second each
+    assert clock.now == pytest.approx(2.0)
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+
+def test_call_with_retry():
+    clock = FakeClock()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("boom")
+        return "ok"
+
+    assert call_with_retry(flaky, retries=3, backoff=1.0, sleep=clock.sleep) == "ok"
+    assert len(attempts) == 3 and len(clock.sleeps) == 2
+    assert all(0 <= s <= 1.0 * 2**i for i, s in enumerate(clock.sleeps))
+
+    with pytest.raises(ZeroDivisionError):
+        call_with_retry(lambda: 1 / 0, retries=2, sleep=clock.sleep)
+    assert len(clock.sleeps) == 4
+
+
+def test_market_sync_fetches_concurrently_and_stores_everything():
+    symbols = [f"{i:06d}.SZ" for i in range(20)] + ["EMPTY.SZ"]
+    pro = FakePro(failures={"000003.SZ": 2, "000007.SZ": -1}, delay=0.02)
+    stored = {}
+    store_threads = set()
+
+    def store(df, task):
+        store_threads.add(threading.get_ident())
+        stored[task.symbol] = len(df)
+        return len(df)
+
+    sync = MarketSync(
+        pro,
+        store,
+        calls_per_minute=60_000,
+        workers=4,
+        queue_size=2,
+        retries=2,
+        backoff=0.0,
+    )
+    report = sync.run(_tasks(symbols))
+
+    assert report.total == len(symbols)
+    assert set(report.failed) == {"000007.SZ"}
+    assert report.empty == 1
+    assert report.fetched == len(symbols) - 1
+    assert set(stored) == set(symbols) - {"000007.SZ", "EMPTY.SZ"}
+    assert report.stored_records == 5 * len(stored)
+    # two retries of the transient failure, three attempts of the permanent one
+    assert pro.calls.count("000003.SZ") == 3
+    assert pro.calls.count("000007.SZ") == 3
+    assert pro.max_active > 1
+    assert store_threads == {threading.get_ident()}
+
+
+def test_market_sync_stops_on_store_error():
+    pro = FakePro()
+
+    def store(df, task):
+        raise ValueError("mongo down")
+
+    sync = MarketSync(pro, store, calls_per_minute=60_000, workers=2, queue_size=1)
+    with pytest.raises(ValueError):
+        sync.run(_tasks([f"{i:06d}.SZ" for i in range(50)]))
+    # the pending fetches are cancelled instead of running to the end
+    assert len(pro.calls) < 50
+
+
+def test_plan_sync():
+    plan = plan_sync(
+        {"A": "20250820", "B": "20250815", "C": None, "D": "20250820"},
+        end_date="20250822",
+        default_start_date="20100101",
+    )
+    assert plan.watermark == "20250820"
+    assert plan.date_major == ["A", "B", "D"]
+    assert plan.backfill == {
+        "B": ("20250816", "20250820"),
+        "C": ("20100101", "20250822"),
+    }
+    assert plan_sync({"A": None}, "20250822", "20100101").watermark is None
+
+
+def test_market_sync_by_date_stores_one_frame_per_day():
+    pro = FakePro(failures={"20250821": -1})
+    stored = {}
+
+    def store(df, task):
+        assert task.symbol is None
+        assert task.start_date == task.end_date
+        stored[task.start_date] = (sorted(df["ts_code"]), task.index_component)
+        return len(df)
+
+    sync = MarketSync(pro, store, calls_per_minute=60_000, retries=1, backoff=0.0)
+    trade_dates = sync.trading_days("20250818", "20250822")
+    assert trade_dates == ["20250818", "20250819", "20250820", "20250821", "20250822"]
+    report = sync.run_by_date(
+        ["20250819", "20250820", "20250821", "20250822"],
+        {"000001.SZ": "hs300", "600000.SH": None},
+    )
+
+    # one call per day (plus the retry of the failing one), not per symbol
+    assert sorted(pro.calls) == [
+        "20250819",
+        "20250820",
+        "20250821",
+        "20250821",
+        "20250822",
+    ]
+    # the day after the failed one is fetched but held back
+    assert set(report.failed) == {"20250821", "20250822"}
+    assert report.fetched == 3
+    # one store per day with every known symbol, unknown symbols are skipped
+    index_components = {"000001.SZ": "hs300", "600000.SH": None}
+    assert stored == {
+        "20250819": (["000001.SZ", "600000.SH"], index_components),
+        "20250820": (["000001.SZ", "600000.SH"], index_components),
+    }
+    assert report.stored_records == 4
+
+    # no hole: the next plan starts right after the last stored day
+    last_dates = dict.fromkeys(index_components, max(stored))
+    plan = plan_sync(last_dates, "20250822", "20100101")
+    assert sync.trading_days(next_day(plan.watermark), "20250822") == [
+        "20250821",
+        "20250822",
+    ]
+
+
+def _stored_rows():
+    return [
+        {"symbol": "000001.SZ", "date": "20250818"},
+        {"symbol": "000001.SZ", "date": "20250820"},
+        {"symbol": "000001.SZ", "date": "20250819"},
+        {"symbol": "600000.SH", "date": "20250815"},
+    ]
+
+
+def test_fetch_last_dates_mongo():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient()["panda"]["stock_market"]
+    collection.create_index([("symbol", 1), ("date", 1)], unique=True)
+    collection.insert_many(_stored_rows())
+
+    assert fetch_last_dates(collection) == {
+        "000001.SZ": "20250820",
+        "600000.SH": "20250815",
+    }
+    assert fetch_last_dates(collection, ["600000.SH", "000002.SZ"]) == {
+        "600000.SH": "20250815"
+    }
+
+
+def test_fetch_last_dates_sqlite(tmp_path):
+    db_path = tmp_path.joinpath("stock.db")
+    conn = sqlite3.connect(db_path)
+    pd.DataFrame(_stored_rows()).to_sql("stock_data", conn, index=False)
+    conn.close()
+    assert fetch_last_dates_sqlite(db_path) == {
+        "000001.SZ": "20250820",
+        "600000.SH": "20250815",
+    }
+
+
+def test_st_symbols_reach_the_store_in_both_modes():
+    stored = {}
+
+    def store(df, task):
+        # like stock_market_fetch_and_instore, date-major frames hold every symbol
+        st_symbols = sync.st_symbols
+        for doc in build_documents(df, task.index_component, st_symbols=st_symbols):
+            stored[(doc["symbol"], doc["date"])] = doc["limit_up"]
+        return len(df)
+
+    sync = MarketSync(FakePro(), store, calls_per_minute=60_000)
+    assert sync.load_st_symbols() == {"000002.SZ", "600000.SH", "688001.SH"}
+    sync.run(_tasks(["000001.SZ", "000002.SZ"]))
+    sync.run_by_date(["20250825"])
+
+    # pre_close is 1.0: 10% main board, 5% ST, STAR Market keeps its 20%
+    assert stored[("000001.SZ", "20250818")] == 1.1
+    assert stored[("000002.SZ", "20250818")] == 1.05
+    assert stored[("000001.SZ", "20250825")] == 1.1
+    assert stored[("000002.SZ", "20250825")] == 1.05
+    assert stored[("600000.SH", "20250825")] == 1.05
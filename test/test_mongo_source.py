@@ -0,0 +1,172 @@
+import importlib
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1].joinpath("data_loader")))
+
+from data_loader import MongoSymbolSource, read_as_df, read_in_chunks  # noqa: E402
+
+URI = "mongodb://localhost:27017/panda"
+
+
+def _documents():
+    rows = []
+    for symbol, n_days in (("600000.SH", 4), ("000001.SZ", 5), ("000002.SZ", 3)):
+        for i, date in enumerate(pd.bdate_range("20250818", periods=n_days)):
+            rows.append(
+                {
+                    "symbol": symbol,
+                    "date": date.strftime("%Y%m%d"),
+                    "open": 10.0 + i,
+                    "close": 10.5 + i,
+                    "volume": 1000.0 * (i + 1),
+                    "index_component": None,
+                }
+            )
+    # stored out of order, the cursor sorts by (symbol, date)
+    return rows[::-1]
+
+
+@pytest.fixture
+def client():
+    client = mongomock.MongoClient()
+    collection = client["panda"]["stock_market"]
+    collection.create_index([("symbol", 1), ("date", 1)], unique=True)
+    collection.insert_many(_documents())
+    return client
+
+
+def test_mongo_source_streams_symbols_in_order(client):
+    source = MongoSymbolSource(URI, batch_size=2, columns=["close"], client=client)
+    groups = list(source)
+
+    assert [df["symbol"].iloc[0] for df in groups] == [
+        "000001.SZ",
+        "000002.SZ",
+        "600000.SH",
+    ]
+    assert [len(df) for df in groups] == [5, 3, 4]
+    assert all(df["symbol"].nunique() == 1 for df in groups)
+    assert all(df["date"].is_monotonic_increasing for df in groups)
+    # projection: the grouping fields and the requested columns only
+    assert all(list(df.columns) == ["symbol", "date", "close"] for df in groups)
+    assert len(source) == 3
+    assert source.symbols() == ["000001.SZ", "000002.SZ", "600000.SH"]
+    assert "_id" not in source.columns
+
+
+def test_mongo_source_filters(client):
+    source = MongoSymbolSource(
+        URI,
+        client=client,
+        limit_nums=2,
+        start_date="2025-08-19",
+        watermarks={"000001.SZ": 20250821},
+    )
+    groups = {df["symbol"].iloc[0]: df["date"].tolist() for df in source}
+    assert groups == {
+        "000001.SZ": ["20250822"],
+        "000002.SZ": ["20250819", "20250820"],
+    }
+    assert len(source) == 2
+
+    partitions = source.partitions()
+    assert partitions.symbols() == ["000001.SZ", "000002.SZ"]
+    assert len(partitions.frame) == 3
+
+
+def test_mongo_source_groups_watermarks_by_date(client):
+    source = MongoSymbolSource(
+        URI,
+        client=client,
+        watermarks={
+            "000001.SZ": 20250820,
+            "600000.SH": pd.Timestamp("2025-08-20"),
+            "000002.SZ": 20250818,
+        },
+    )
+    branches = source._query(client["panda"]["stock_market"])["$or"]
+    # the symbols sharing a watermark share one branch of the query
+    assert branches[1:] == [
+        {"symbol": {"$in": ["000001.SZ", "600000.SH"]}, "date": {"$gt": "20250820"}},
+        {"symbol": {"$in": ["000002.SZ"]}, "date": {"$gt": "20250818"}},
+    ]
+    groups = {df["symbol"].iloc[0]: df["date"].tolist() for df in source}
+    assert groups == {
+        "000001.SZ": ["20250821", "20250822"],
+        "000002.SZ": ["20250819", "20250820"],
+        "600000.SH": ["20250821"],
+    }
+
+
+def test_read_as_df_mongo(client):
+    df = read_as_df(
+        URI,
+        columns=["symbol", "close", "missing"],
+        filters=[("symbol", "in", ["000002.SZ"]), ("date", ">=", "20250819")],
+        client=client,
+    )
+    assert sorted(df.columns) == ["close", "date", "symbol"]
+    assert sorted(df["date"]) == ["20250819", "20250820"]
+
+    chunks = list(read_in_chunks(URI, chunksize=5, client=client))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+
+
+def _import_dumper(name):
+    # the dumpers import each other by lowercase names, which only resolve to
+    # the CamelCase files on case-insensitive file systems
+    sys.modules.setdefault("base_dumper", importlib.import_module("Base_Dumper"))
+    return importlib.import_module(name)
+
+
+def test_dump_all_from_mongo_matches_sqlite(tmp_path):
+    all_dumper = _import_dumper("All_Dumper")
+
+    db_path = tmp_path.joinpath("stock.db")
+    conn = sqlite3.connect(db_path)
+    pd.DataFrame(_documents()).to_sql("stock_market", conn, index=False)
+    conn.close()
+
+    with mongomock.patch(servers=(("localhost", 27017),)):
+        import pymongo
+
+        pymongo.MongoClient(URI)["panda"]["stock_market"].insert_many(_documents())
+        all_dumper.DumpDataAll(
+            URI,
+            tmp_path.joinpath("qlib_mongo"),
+            table_name="stock_market",
+            include_fields="open,close,volume",
+            read_chunksize=4,
+            max_workers=1,
+        )()
+    all_dumper.DumpDataAll(
+        str(db_path),
+        tmp_path.joinpath("qlib_sqlite"),
+        table_name="stock_market",
+        include_fields="open,close,volume",
+        max_workers=1,
+    )()
+
+    mongo_dir = tmp_path.joinpath("qlib_mongo")
+    sqlite_dir = tmp_path.joinpath("qlib_sqlite")
+    for name in ("calendars/day.txt", "instruments/all.txt"):
+        assert (
+            mongo_dir.joinpath(name).read_text()
+            == sqlite_dir.joinpath(name).read_text()
+        )
+    bins = sorted(p.relative_to(sqlite_dir) for p in sqlite_dir.rglob("*.bin"))
+    assert len(bins) == 9
+    assert bins == sorted(p.relative_to(mongo_dir) for p in mongo_dir.rglob("*.bin"))
+    for path in bins:
+        np.testing.assert_array_equal(
+            np.fromfile(mongo_dir.joinpath(path), dtype="<f4"),
+            np.fromfile(sqlite_dir.joinpath(path), dtype="<f4"),
+        )
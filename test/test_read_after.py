@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1].joinpath("data_loader")))
+
+from data_loader import _read_csv_after, read_after  # noqa: E402
+
+# long enough for the backward scan to cross several 64 KiB blocks
+DATES = pd.bdate_range("20000103", periods=6000)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path.joinpath("000001.SZ.csv")
+    pd.DataFrame(
+        {
+            "symbol": "000001.SZ",
+            "date": DATES.strftime("%Y%m%d").astype(int),
+            "close": range(len(DATES)),
+        }
+    ).to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize(
+    "after, n_rows",
+    [
+        (DATES[3000], len(DATES) - 3001),  # in the middle of the file
+        (DATES[-1], 0),  # at the last row
+        (DATES[0] - pd.Timedelta(days=1), len(DATES)),  # before the first row
+    ],
+)
+def test_read_csv_after_watermark(csv_path, after, n_rows):
+    df = _read_csv_after(csv_path, "date", after)
+    full = pd.read_csv(csv_path)
+    expected = full[pd.to_datetime(full["date"].astype(str)) > after]
+    assert list(df.columns) == ["symbol", "date", "close"]
+    assert len(df) == n_rows
+    # an empty tail has no values to infer the dtypes from
+    pd.testing.assert_frame_equal(
+        df, expected.reset_index(drop=True), check_dtype=bool(n_rows)
+    )
+
+
+def test_read_csv_after_falls_back_on_descending_files(csv_path):
+    df = pd.read_csv(csv_path).iloc[::-1]
+    df.to_csv(csv_path, index=False)
+    assert _read_csv_after(csv_path, "date", DATES[3000]) is None
+    # read_after then reads the whole file
+    assert len(read_after(csv_path, "date", DATES[3000])) == len(DATES)